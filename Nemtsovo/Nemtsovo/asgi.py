@@ -12,5 +12,16 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Nemtsovo.settings')
+# постоянные соединения с БД под ASGI не переиспользуются (см. CONN_MAX_AGE в settings)
+os.environ['SERVED_BY_ASGI'] = '1'
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# модели можно импортировать только после настройки джанго
+from landing.live import live_bookings_app  # noqa: E402
+from landing.warmup import warm_up_worker  # noqa: E402
+
+application = live_bookings_app(django_application)
+
+# первый запрос не должен платить за импорты, компиляцию шаблонов и соединение с БД
+warm_up_worker()
@@ -20,6 +20,12 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = not not os.getenv("DEBUG")
 IS_PROD = not not os.getenv("IS_PROD")
+# Async public views, only useful when served through asgi.py
+ASYNC_VIEWS = not not os.getenv("ASYNC_VIEWS")
+# Sync public views stream the <head> first and render the body after it (landing.streaming)
+STREAMED_PAGES = not not os.getenv("STREAMED_PAGES")
+# wsgi.py/asgi.py warm the worker up before the first request (landing.warmup)
+WARMUP_ON_START = IS_PROD or not not os.getenv("WARMUP_ON_START")
 
 ALLOWED_HOSTS = ['nemtsovo-ecofarm.ru', 'www.nemtsovo-ecofarm.ru'] if IS_PROD else ['*']
 
@@ -40,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'landing.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -47,6 +54,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'landing.profiling.profiling_middleware',
+    'landing.middleware.replica_routing_middleware',
 ]
 
 ROOT_URLCONF = 'Nemtsovo.urls'
@@ -59,8 +68,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # templates are compiled once per worker (and preloaded by landing.warmup);
+            # in DEBUG the cached loader still picks up edited files
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -71,12 +87,31 @@ TEMPLATES = [
     },
 ]
 
+# Public pages can be rendered by Jinja2 (templates in landing/jinja2) instead of the Django engine:
+# JINJA2_TEMPLATES=1. The engine goes first, so admin and other templates still come from DjangoTemplates.
+# Compare both with manage.py bench_templates
+JINJA2_TEMPLATES = not not os.getenv("JINJA2_TEMPLATES")
+JINJA2_BYTECODE_CACHE_DIR = os.getenv("JINJA2_BYTECODE_CACHE_DIR")
+JINJA2_BACKEND = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'DIRS': [],
+    'APP_DIRS': True,
+    'OPTIONS': {
+        'environment': 'landing.jinja_env.environment',
+    },
+}
+if JINJA2_TEMPLATES:
+    TEMPLATES.insert(0, JINJA2_BACKEND)
+
 WSGI_APPLICATION = 'Nemtsovo.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# MySQL is always used in production; set USE_MYSQL=1 to run against a local MySQL/MariaDB (MYSQL_* variables)
+USE_MYSQL = IS_PROD or not not os.getenv("USE_MYSQL")
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.mysql',
@@ -85,13 +120,164 @@ DATABASES = {
         'PASSWORD': os.getenv("MYSQL_PASSWORD"),
         'HOST': os.getenv("MYSQL_HOST")
     }
-} if IS_PROD else {
+} if USE_MYSQL else {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
 
+# Applied to every new SQLite connection (see landing.sqlite_tuning):
+# WAL lets readers work alongside a writer, busy_timeout waits for the lock instead of failing
+# Set SQLITE_DEFAULT_PRAGMAS=1 to run with SQLite defaults
+SQLITE_PRAGMAS = {} if os.getenv("SQLITE_DEFAULT_PRAGMAS") else {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32000,
+    'temp_store': 'MEMORY',
+}
+
+# Response compression (landing.compression): brotli if installed, otherwise gzip.
+# Compressed bodies are cached by the hash of the body, so hot pages are compressed once
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_CACHE_ALIAS = 'default'
+COMPRESSION_CACHE_TIMEOUT = 60 * 60
+COMPRESSION_CACHE_MAX_SIZE = 1024 * 1024
+
+# ErrorLog retention (manage.py purge_error_logs)
+ERROR_LOG_SOLVED_RETENTION_DAYS = 30
+ERROR_LOG_RETENTION_DAYS = 180
+
+# Finished and canceled bookings older than this go to ArchivedBooking (manage.py archive_bookings)
+BOOKING_ARCHIVE_AFTER_DAYS = 180
+# Admin booking export (landing.exports) reads and streams rows in batches of this size
+BOOKING_EXPORT_CHUNK_SIZE = 2000
+
+# Admin changelists of big tables show an estimated count above this many rows (landing.paginators)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000
+ADMIN_ESTIMATED_COUNT_CACHE_TIMEOUT = 5 * 60
+
+# Read replica for public pages (see landing.db_routers)
+# Locally a second SQLite file can play the replica: DB_REPLICA=1
+if USE_MYSQL and os.getenv("MYSQL_REPLICA_HOST"):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv("MYSQL_REPLICA_HOST"),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif not USE_MYSQL and os.getenv("DB_REPLICA"):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db-replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Keep connections open between requests, so the ones opened by the warm-up are reused.
+# WSGI only: Django 4.1 ASGI runs every request in a new thread, and a persistent connection opened there
+# is never reused or closed, so asgi.py sets SERVED_BY_ASGI and connections close after each request
+SERVED_BY_ASGI = not not os.getenv("SERVED_BY_ASGI")
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = 0 if SERVED_BY_ASGI else int(os.getenv("CONN_MAX_AGE", "60" if IS_PROD else "0"))
+    database['CONN_HEALTH_CHECKS'] = True
+
+DATABASE_ROUTERS = ['landing.db_routers.PrimaryReplicaRouter']
+
+# After a write the client reads from the primary for this long
+REPLICA_STICKY_COOKIE = 'use_primary_db'
+REPLICA_STICKY_SECONDS = 10
+
+# Caches. 'ratelimit' holds token buckets and shed-load counters (landing.ratelimit).
+# With SHARED_CACHE_DIR set both live in memory-mapped files shared by all workers on the host
+# (landing.cache_backends.SharedMemoryCache); otherwise every worker has its own LocMemCache
+SHARED_CACHE_DIR = os.getenv("SHARED_CACHE_DIR")
+if SHARED_CACHE_DIR:
+    CACHES = {
+        'default': {
+            'BACKEND': 'landing.cache_backends.SharedMemoryCache',
+            'LOCATION': os.path.join(SHARED_CACHE_DIR, 'default.cache'),
+            # the file is sparse; keep it on tmpfs (e.g. /dev/shm/nemtsovo) so it never touches the disk
+            'OPTIONS': {'MAX_ENTRIES': 2048, 'SLOT_SIZE': 128 * 1024},
+        },
+        'ratelimit': {
+            'BACKEND': 'landing.cache_backends.SharedMemoryCache',
+            'LOCATION': os.path.join(SHARED_CACHE_DIR, 'ratelimit.cache'),
+            'OPTIONS': {'MAX_ENTRIES': 16384, 'SLOT_SIZE': 256},
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'ratelimit': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ratelimit',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    }
+
+# Token buckets per endpoint: (capacity, tokens refilled per second) for one client IP and, optionally,
+# for all clients. add_booking has no 'total' bucket: a handful of addresses could drain a shared one
+# and lock every real customer out of booking
+RATE_LIMIT_CACHE_ALIAS = 'ratelimit'
+# Behind nginx REMOTE_ADDR is the proxy and the client is the LAST X-Forwarded-For address, the one nginx
+# appended (proxy_add_x_forwarded_for); earlier entries come from the client and are ignored
+RATE_LIMIT_TRUST_X_FORWARDED_FOR = IS_PROD or not not os.getenv("RATE_LIMIT_TRUST_X_FORWARDED_FOR")
+# Set RATE_LIMIT_DISABLED=1 to turn limits off, e.g. for manage.py loadtest_booking_rush
+RATE_LIMITS = {} if os.getenv("RATE_LIMIT_DISABLED") else {
+    'add_booking': {
+        'per_ip': (5, 1 / 60),
+    },
+    'get_booked_days': {
+        'per_ip': (30, 1),
+        'total': (300, 50),
+    },
+    'search': {
+        'per_ip': (20, 2),
+        'total': (200, 50),
+    },
+}
+
+# Outbox for new bookings (landing.notifications), delivered by manage.py send_notifications.
+# One Notification row per channel; BACKEND is any landing.notifications.BaseBackend subclass.
+# Set NOTIFICATIONS_DISABLED=1 to queue nothing, e.g. for manage.py loadtest_booking_rush
+NOTIFICATION_BACKENDS = {} if os.getenv("NOTIFICATIONS_DISABLED") else {
+    'email': {
+        'BACKEND': 'landing.notifications.EmailBackend',
+    },
+}
+NOTIFICATION_EMAILS = [email for email in os.getenv("NOTIFICATION_EMAILS", "").split(',') if email]
+NOTIFICATION_BATCH_SIZE = 50
+NOTIFICATION_MAX_ATTEMPTS = 8
+NOTIFICATION_RETRY_BASE_SECONDS = 30
+NOTIFICATION_LEASE_SECONDS = 5 * 60
+
+# Locally point this at an SMTP stand-in: python -m aiosmtpd -n -l localhost:1025 (pip install aiosmtpd),
+# or set EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+EMAIL_HOST = os.getenv("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "25" if IS_PROD else "1025"))
+EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = not not os.getenv("EMAIL_USE_TLS")
+EMAIL_TIMEOUT = 10
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "webmaster@nemtsovo-ecofarm.ru")
+
+# Booking changelist gets new and changed bookings over SSE (landing.live, only when served through asgi.py)
+LIVE_BOOKINGS_POLL_SECONDS = 2
+LIVE_BOOKINGS_HEARTBEAT_SECONDS = 15
+# Bookings committed late (date_update older than ones already sent) are picked up within this window
+LIVE_BOOKINGS_OVERLAP_SECONDS = 10
+
+# Sampling profiler (landing.profiling): this fraction of requests, plus staff requests carrying
+# the X-Profile header or the "profile" cookie, are stored as RequestProfile with collapsed stacks
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_HEADER = 'HTTP_X_PROFILE'
+PROFILING_COOKIE = 'profile'
+PROFILING_INTERVAL = 0.005
+PROFILING_KEEP = 500
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -132,6 +318,40 @@ STATIC_ROOT = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = 'media/' if IS_PROD else os.path.join(BASE_DIR, 'media')
 
+# Store uploads under the hash of their content (media/landing/cas/), deduplicated across objects.
+# These URLs never change, so the front server can send them with
+# "Cache-Control: public, max-age=31536000, immutable"
+MEDIA_CONTENT_ADDRESSED = not not os.getenv("MEDIA_CONTENT_ADDRESSED")
+if MEDIA_CONTENT_ADDRESSED:
+    DEFAULT_FILE_STORAGE = 'landing.storage.ContentAddressedStorage'
+
+# Uploaded photos are rotated by EXIF, stripped of metadata, downscaled and re-encoded (landing.image_processing)
+UPLOAD_IMAGE_OPTIMIZE = not os.getenv("UPLOAD_IMAGE_KEEP_ORIGINAL")
+UPLOAD_IMAGE_MAX_EDGE = 2560
+UPLOAD_IMAGE_FORMAT = os.getenv("UPLOAD_IMAGE_FORMAT", 'JPEG')  # 'JPEG' or 'WEBP'
+UPLOAD_IMAGE_QUALITY = 82
+
+# Resumable uploads in the Фото/Видео inline (landing.uploads): files larger than one chunk are sent in
+# CHUNKED_UPLOAD_CHUNK_SIZE pieces, each checked by sha256 and appended to a file in CHUNKED_UPLOAD_DIR.
+# Keep the directory on the same filesystem as MEDIA_ROOT, so the finished file is moved, not copied.
+# The front server must accept request bodies of at least one chunk (nginx client_max_body_size)
+CHUNKED_UPLOAD_DIR = os.getenv("CHUNKED_UPLOAD_DIR") or os.path.join(BASE_DIR, 'chunked-uploads')
+CHUNKED_UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = 4 * 1024 * 1024 * 1024
+CHUNKED_UPLOAD_EXPIRE_HOURS = 48
+
+# Serve MEDIA_URL from Django (landing.media.serve_media, supports Range requests)
+SERVE_MEDIA = DEBUG or not not os.getenv("SERVE_MEDIA")
+# Hand the transfer to the front server: 'X-Accel-Redirect' (nginx) or 'X-Sendfile' (apache, lighttpd)
+# For nginx MEDIA_ACCEL_REDIRECT_PREFIX must be an internal location aliased to MEDIA_ROOT
+MEDIA_SENDFILE_HEADER = os.getenv("MEDIA_SENDFILE_HEADER")
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+# Pre-rendered public pages (manage.py export_static), served by the front server
+# Admin changes re-render affected pages in background only when it is set.
+# Events drop off the pages by time, not by edits, so also run from cron:
+# */5 * * * * python manage.py export_static --passed-events
+STATIC_EXPORT_ROOT = os.getenv('STATIC_EXPORT_ROOT')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
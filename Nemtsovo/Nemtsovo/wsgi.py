@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Nemtsovo.settings')
 
 application = get_wsgi_application()
+
+# первый запрос не должен платить за импорты, компиляцию шаблонов и соединение с БД
+from landing.warmup import warm_up_worker  # noqa: E402
+
+warm_up_worker()
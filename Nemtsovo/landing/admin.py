@@ -1,17 +1,47 @@
 from .models import *
 from django.contrib.contenttypes.admin import GenericTabularInline
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
 from django.forms import TextInput
 from adminsortable2.admin import SortableAdminBase, SortableGenericInlineAdminMixin, SortableAdminMixin
 from image_cropping import ImageCroppingMixin
+from image_cropping.widgets import ImageCropWidget
+
+from .exports import export_bookings
+from .forms import AttachmentForm
+from .live import LIVE_BOOKINGS_PATH
+from .paginators import EstimatedCountAdminMixin
+from .search import FullTextSearchAdminMixin
 
 
 class AttachmentInline(ImageCroppingMixin, SortableGenericInlineAdminMixin, GenericTabularInline):
     model = Attachment
+    form = AttachmentForm
     extra = 5
 
+    class Media:
+        js = ['landing/js/admin-chunked-upload.js']
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        # класс формы создаётся заново на каждый запрос, так что пользователь не утечёт в чужой запрос
+        formset.form.user = request.user
+        return formset
+
+    def formfield_for_dbfield(self, db_field, request, **kwargs):
+        # image_cropping подбирает виджет только для ImageField, а file - FileField (фото и видео)
+        if db_field.name == 'file':
+            kwargs['widget'] = ImageCropWidget
+            return super(ImageCroppingMixin, self).formfield_for_dbfield(db_field, request, **kwargs)
+        return super().formfield_for_dbfield(db_field, request, **kwargs)
+
 
 @admin.register(House)
-class HouseAdmin(SortableAdminMixin, admin.ModelAdmin):
+class HouseAdmin(FullTextSearchAdminMixin, SortableAdminMixin, admin.ModelAdmin):
     list_display = ("name", "start_price", 'order')
     inlines = [AttachmentInline]
     search_fields = ("name", "description", "start_price")
@@ -35,7 +65,7 @@ class AdditionalInfoAdmin(admin.ModelAdmin):
 
 
 @admin.register(WellnessTreatment)
-class WellnessTreatmentAdmin(SortableAdminMixin, admin.ModelAdmin):
+class WellnessTreatmentAdmin(FullTextSearchAdminMixin, SortableAdminMixin, admin.ModelAdmin):
     list_display = ("name", "start_price", 'order')
     inlines = [AttachmentInline]
     search_fields = ("name", "description", "start_price")
@@ -43,7 +73,7 @@ class WellnessTreatmentAdmin(SortableAdminMixin, admin.ModelAdmin):
 
 
 @admin.register(Action)
-class ActionAdmin(SortableAdminMixin, admin.ModelAdmin):
+class ActionAdmin(FullTextSearchAdminMixin, SortableAdminMixin, admin.ModelAdmin):
     list_display = ("name", 'get_price_or_display_free', 'order')
     inlines = [AttachmentInline]
     search_fields = ("name", "description", "start_price")
@@ -55,7 +85,7 @@ class ActionAdmin(SortableAdminMixin, admin.ModelAdmin):
 
 
 @admin.register(OurProduct)
-class OurProductAdmin(SortableAdminBase, admin.ModelAdmin):
+class OurProductAdmin(FullTextSearchAdminMixin, SortableAdminBase, admin.ModelAdmin):
     list_display = ("name", "price", "is_available")
     inlines = [AttachmentInline]
     list_filter = ("is_available",)
@@ -65,7 +95,7 @@ class OurProductAdmin(SortableAdminBase, admin.ModelAdmin):
 
 
 @admin.register(Event)
-class EventAdmin(SortableAdminBase, admin.ModelAdmin):
+class EventAdmin(FullTextSearchAdminMixin, SortableAdminBase, admin.ModelAdmin):
     list_display = ("title", "date", 'is_passed')
     inlines = [AttachmentInline]
     list_filter = ["date"]
@@ -75,7 +105,7 @@ class EventAdmin(SortableAdminBase, admin.ModelAdmin):
 
 
 @admin.register(News)
-class NewsAdmin(SortableAdminBase, admin.ModelAdmin):
+class NewsAdmin(FullTextSearchAdminMixin, SortableAdminBase, admin.ModelAdmin):
     list_display = ("title", "date")
     inlines = [AttachmentInline]
     list_filter = ["date"]
@@ -86,24 +116,35 @@ class NewsAdmin(SortableAdminBase, admin.ModelAdmin):
 
 @admin.action(description="Подтвердить выбранные Заявки на бронирование")
 def make_approved(model_admin, request, queryset):
-    queryset.update(status='b')
+    queryset.update(status='b', date_update=timezone.now())
 
 
 @admin.action(description="Закрыть выбранные Заявки на бронирование")
 def make_canceled(model_admin, request, queryset):
-    queryset.update(status='c')
+    queryset.update(status='c', date_update=timezone.now())
 
 
 @admin.action(description="Сделать активными выбранные Заявки на бронирование")
 def make_active(model_admin, request, queryset):
-    queryset.update(status='a')
+    queryset.update(status='a', date_update=timezone.now())
+
+
+@admin.action(description="Выгрузить в CSV")
+def export_csv(model_admin, request, queryset):
+    return export_bookings(request, queryset, 'csv')
+
+
+@admin.action(description="Выгрузить в Excel (xlsx)")
+def export_xlsx(model_admin, request, queryset):
+    return export_bookings(request, queryset, 'xlsx')
 
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = ('get_booking_name', "fio", 'phone_number', 'desired_dates', 'date_start_fact',
                     'date_end_fact', 'early_late_check', 'status', 'date_create')
     list_editable = ['status']
+    list_select_related = ['booking_identifier']
     readonly_fields = (
         'fio', 'phone_number', 'adults_count', 'childs_count', 'desired_dates', 'is_has_whatsapp', 'date_create',
         'user_comment')
@@ -111,7 +152,7 @@ class BookingAdmin(admin.ModelAdmin):
     ordering = ['status', '-date_create']
     save_on_top = True
     list_per_page = 10
-    actions = [make_approved, make_canceled, make_active]
+    actions = [make_approved, make_canceled, make_active, export_csv, export_xlsx]
     exclude = ['is_dayly']
     fieldsets = [
         (
@@ -129,6 +170,10 @@ class BookingAdmin(admin.ModelAdmin):
         )
     ]
 
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {'live_bookings_url': LIVE_BOOKINGS_PATH, **(extra_context or {})}
+        return super().changelist_view(request, extra_context)
+
     def get_row_css(self, obj, index):
         if obj.status == 'a':
             return 'red red%d' % index
@@ -155,6 +200,27 @@ class BookingAdmin(admin.ModelAdmin):
         return "/".join(text)
 
 
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
+    list_display = ('booking_identifier', 'fio', 'phone_number', 'desired_dates', 'date_start_fact',
+                    'date_end_fact', 'status', 'date_create', 'date_archived')
+    list_filter = ['status', 'date_create']
+    list_select_related = ('booking_identifier',)
+    search_fields = ('fio', 'phone_number')
+    ordering = ['-date_create']
+    list_per_page = 50
+    actions = [export_csv, export_xlsx]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(OurPet)
 class OurPetAdmin(SortableAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'order')
@@ -162,14 +228,102 @@ class OurPetAdmin(SortableAdminMixin, admin.ModelAdmin):
 
 
 @admin.register(ErrorLog)
-class ErrorLogAdmin(admin.ModelAdmin):
+class ErrorLogAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = ('error_message', 'date', 'is_solved')
     list_filter = ('is_solved', 'date')
     list_editable = ['is_solved']
     readonly_fields = ('error_message', 'stack_trace', 'date', 'additional_info')
+
+    def get_queryset(self, request):
+        # трассировку и payload в списке не показываем, незачем их читать
+        return super().get_queryset(request).defer('stack_trace', 'additional_info')
+
     def has_add_permission(self, request):
         return False
 
 
+@admin.register(ErrorLogDailyCount)
+class ErrorLogDailyCountAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
+    list_display = ('day', 'error_message', 'count')
+    list_filter = ('day',)
+    search_fields = ('error_message',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 admin.site.register(BookingIdentifier)
 admin.site.register(Period)
+
+
+@admin.action(description='Отправить повторно')
+def retry_notifications(model_admin, request, queryset):
+    queryset.exclude(status=Notification.SENT).update(
+        status=Notification.PENDING, attempts=0, next_attempt_at=timezone.now())
+
+
+@admin.register(Notification)
+class NotificationAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
+    list_display = ('subject', 'channel', 'status', 'attempts', 'date_create', 'date_sent')
+    list_filter = ('status', 'channel')
+    readonly_fields = ('channel', 'subject', 'body', 'status', 'attempts', 'next_attempt_at', 'last_error',
+                       'date_create', 'date_sent')
+    actions = [retry_notifications]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
+    list_display = ('date', 'method', 'path', 'route', 'status_code', 'duration_ms', 'sql_count', 'trigger')
+    list_filter = ('trigger', 'route', 'date')
+    search_fields = ('path',)
+    readonly_fields = ('date', 'method', 'path', 'route', 'status_code', 'duration_ms', 'sql_count',
+                       'sql_duration_ms', 'get_sql_summary', 'get_collapsed_stacks')
+    exclude = ('sql_summary', 'collapsed_stacks')
+
+    def get_queryset(self, request):
+        # стеки в списке не нужны, а весят больше всего
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            queryset = queryset.defer('sql_summary', 'collapsed_stacks')
+        return queryset
+
+    def get_urls(self):
+        return [
+            path('<int:object_id>/collapsed/', self.admin_site.admin_view(self.collapsed_view),
+                 name='landing_requestprofile_collapsed'),
+        ] + super().get_urls()
+
+    def collapsed_view(self, request, object_id):
+        # admin_view проверяет только is_staff, а в стеках и SQL могут быть данные запросов
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        profile = get_object_or_404(RequestProfile, pk=object_id)
+        response = HttpResponse(profile.collapsed_stacks, content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="profile-{profile.pk}.folded"'
+        return response
+
+    @admin.display(description='Самые затратные запросы')
+    def get_sql_summary(self, obj):
+        return format_html('<pre>{}</pre>', obj.sql_summary)
+
+    @admin.display(description='Стеки (collapsed)')
+    def get_collapsed_stacks(self, obj):
+        return format_html(
+            '<p><a href="{}">Скачать .folded</a> (открывается в speedscope.app или flamegraph.pl)</p>'
+            '<pre style="max-height: 40em; overflow: auto">{}</pre>',
+            reverse('admin:landing_requestprofile_collapsed', args=[obj.pk]), obj.collapsed_stacks)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,264 @@
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.exceptions import ImproperlyConfigured
+
+MAGIC = b'NMTCACHE'
+FORMAT_VERSION = 1
+# magic, версия формата, кол-во корзин, размер слота
+HEADER = struct.Struct('<8sIII')
+# хеш ключа, когда истекает (0 - никогда), последнее обращение, длина значения
+SLOT_HEADER = struct.Struct('<16sddI')
+EMPTY_DIGEST = bytes(16)
+# ключ попадает в свою корзину из WAYS слотов, вытесняется самый давно использованный слот корзины
+WAYS = 8
+THREAD_LOCKS = 64
+
+
+class SharedMemoryCache(BaseCache):
+    # Кеш в memory-mapped файле (LOCATION), общий для всех воркеров на сервере.
+    # Каждая корзина защищена блокировкой своего диапазона байт файла (fcntl.lockf),
+    # так что get/set/incr атомарны между процессами, а разные корзины не мешают друг другу.
+    # Значения больше SLOT_SIZE не кешируются
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        if fcntl is None:
+            raise ImproperlyConfigured('SharedMemoryCache работает только там, где есть fcntl (Linux)')
+
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._slot_size = int(options.get('SLOT_SIZE', 64 * 1024))
+        self._buckets = max(1, self._max_entries // WAYS)
+        self._bucket_size = WAYS * self._slot_size
+        self._file_size = HEADER.size + self._buckets * self._bucket_size
+
+        self._fd = None
+        self._mmap = None
+        self._pid = None
+        self._open_lock = threading.Lock()
+        # блокировки fcntl принадлежат процессу, потоки одного процесса разводим обычными
+        self._thread_locks = [threading.Lock() for _ in range(THREAD_LOCKS)]
+
+    def _open(self):
+        # после fork у процесса свои блокировки fcntl - файл открываем заново в каждом процессе
+        if self._pid == os.getpid():
+            return
+
+        with self._open_lock:
+            if self._pid == os.getpid():
+                return
+
+            # Разметка (версия формата, корзины, размер слота) - в имени файла. Живой файл никогда не обрезаем:
+            # другие процессы держат его в mmap и упали бы с SIGBUS. Воркеры с новыми OPTIONS
+            # (например, при поэтапном деплое) просто заводят свой файл, старый можно удалить после деплоя
+            path = f'{self._path}.v{FORMAT_VERSION}-{self._buckets}x{self._slot_size}'
+            header = HEADER.pack(MAGIC, FORMAT_VERSION, self._buckets, self._slot_size)
+            try:
+                fd = os.open(path, os.O_RDWR)
+            except FileNotFoundError:
+                fd = self._create(path, header)
+
+            if os.fstat(fd).st_size != self._file_size or os.pread(fd, HEADER.size, 0) != header:
+                os.close(fd)
+                raise ImproperlyConfigured(f'{path} не похож на файл SharedMemoryCache с такими настройками')
+
+            self._mmap = mmap.mmap(fd, self._file_size)
+            self._fd = fd
+            self._pid = os.getpid()
+
+    def _create(self, path, header):
+        # файл готовим под временным именем и публикуем через link: его либо нет, либо он уже размечен,
+        # а если другой процесс успел первым - открываем его файл
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            # файл разреженный: место занимают только записанные слоты
+            os.ftruncate(fd, self._file_size)
+            os.pwrite(fd, header, 0)
+            os.link(tmp_path, path)
+        except FileExistsError:
+            os.close(fd)
+            fd = os.open(path, os.O_RDWR)
+        except BaseException:
+            os.close(fd)
+            raise
+        finally:
+            os.unlink(tmp_path)
+        return fd
+
+    @contextmanager
+    def _locked(self, bucket):
+        self._open()
+        start = HEADER.size + bucket * self._bucket_size
+        with self._thread_locks[bucket % THREAD_LOCKS]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self._bucket_size, start)
+            try:
+                yield start
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self._bucket_size, start)
+
+    def _locate(self, key, version):
+        key = self.make_and_validate_key(key, version=version)
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        return digest, int.from_bytes(digest[:8], 'little') % self._buckets
+
+    def _find(self, bucket_start, digest, now):
+        # (смещение слота, его заголовок) или None; протухшие записи заодно освобождаются
+        for way in range(WAYS):
+            offset = bucket_start + way * self._slot_size
+            slot = SLOT_HEADER.unpack_from(self._mmap, offset)
+            if slot[0] != digest:
+                continue
+            if slot[1] and slot[1] <= now:
+                self._mmap[offset:offset + 16] = EMPTY_DIGEST
+                return None
+            return offset, slot
+        return None
+
+    def _choose_slot(self, bucket_start, now):
+        # свободный или протухший слот, иначе самый давно использованный
+        lru_offset, lru_accessed = None, None
+        for way in range(WAYS):
+            offset = bucket_start + way * self._slot_size
+            digest, expires, accessed, length = SLOT_HEADER.unpack_from(self._mmap, offset)
+            if digest == EMPTY_DIGEST or (expires and expires <= now):
+                return offset
+            if lru_accessed is None or accessed < lru_accessed:
+                lru_offset, lru_accessed = offset, accessed
+        return lru_offset
+
+    def _read(self, offset, slot, now):
+        length = slot[3]
+        data_start = offset + SLOT_HEADER.size
+        value = pickle.loads(self._mmap[data_start:data_start + length])
+        SLOT_HEADER.pack_into(self._mmap, offset, slot[0], slot[1], now, length)
+        return value
+
+    def _write(self, bucket_start, digest, data, expires, now):
+        found = self._find(bucket_start, digest, now)
+        if len(data) > self._slot_size - SLOT_HEADER.size:
+            # не помещается - убираем старое значение, чтобы не отдавать устаревшее
+            if found:
+                self._mmap[found[0]:found[0] + 16] = EMPTY_DIGEST
+            return False
+
+        offset = found[0] if found else self._choose_slot(bucket_start, now)
+        data_start = offset + SLOT_HEADER.size
+        self._mmap[data_start:data_start + len(data)] = data
+        SLOT_HEADER.pack_into(self._mmap, offset, digest, expires or 0, now, len(data))
+        return True
+
+    def _serialize(self, value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        digest, bucket = self._locate(key, version)
+        data = self._serialize(value)
+        with self._locked(bucket) as bucket_start:
+            now = time.time()
+            if self._find(bucket_start, digest, now):
+                return False
+            return self._write(bucket_start, digest, data, self.get_backend_timeout(timeout), now)
+
+    def get(self, key, default=None, version=None):
+        digest, bucket = self._locate(key, version)
+        with self._locked(bucket) as bucket_start:
+            now = time.time()
+            found = self._find(bucket_start, digest, now)
+            if not found:
+                return default
+            try:
+                return self._read(*found, now)
+            except Exception:
+                # запись испорчена (например, процесс упал посреди записи) - считаем промахом
+                self._mmap[found[0]:found[0] + 16] = EMPTY_DIGEST
+                return default
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        digest, bucket = self._locate(key, version)
+        data = self._serialize(value)
+        with self._locked(bucket) as bucket_start:
+            self._write(bucket_start, digest, data, self.get_backend_timeout(timeout), time.time())
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        digest, bucket = self._locate(key, version)
+        with self._locked(bucket) as bucket_start:
+            now = time.time()
+            found = self._find(bucket_start, digest, now)
+            if not found:
+                return False
+            offset, slot = found
+            expires = self.get_backend_timeout(timeout) or 0
+            SLOT_HEADER.pack_into(self._mmap, offset, slot[0], expires, now, slot[3])
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        # чтение и запись под одной блокировкой: счётчики и номера версий не теряют обновлений
+        digest, bucket = self._locate(key, version)
+        with self._locked(bucket) as bucket_start:
+            now = time.time()
+            found = self._find(bucket_start, digest, now)
+            if not found:
+                raise ValueError("Key '%s' not found" % key)
+
+            offset, slot = found
+            new_value = self._read(offset, slot, now) + delta
+            self._write(bucket_start, digest, self._serialize(new_value), slot[1], now)
+            return new_value
+
+    def update(self, key, func, timeout=DEFAULT_TIMEOUT, version=None):
+        # func(старое значение или None) -> (новое значение, результат); всё под одной блокировкой корзины,
+        # как incr, но для любых значений (например, бакетов landing.ratelimit)
+        digest, bucket = self._locate(key, version)
+        with self._locked(bucket) as bucket_start:
+            now = time.time()
+            found = self._find(bucket_start, digest, now)
+            value = None
+            if found:
+                try:
+                    value = self._read(*found, now)
+                except Exception:
+                    value = None
+            new_value, result = func(value)
+            self._write(bucket_start, digest, self._serialize(new_value), self.get_backend_timeout(timeout), now)
+            return result
+
+    def has_key(self, key, version=None):
+        digest, bucket = self._locate(key, version)
+        with self._locked(bucket) as bucket_start:
+            return self._find(bucket_start, digest, time.time()) is not None
+
+    def delete(self, key, version=None):
+        digest, bucket = self._locate(key, version)
+        with self._locked(bucket) as bucket_start:
+            found = self._find(bucket_start, digest, time.time())
+            if not found:
+                return False
+            self._mmap[found[0]:found[0] + 16] = EMPTY_DIGEST
+            return True
+
+    def clear(self):
+        for bucket in range(self._buckets):
+            with self._locked(bucket) as bucket_start:
+                for way in range(WAYS):
+                    offset = bucket_start + way * self._slot_size
+                    if self._mmap[offset:offset + 16] != EMPTY_DIGEST:
+                        self._mmap[offset:offset + 16] = EMPTY_DIGEST
+
+    def close(self, **kwargs):
+        # mmap держим открытым всё время жизни процесса, как и LocMemCache
+        pass
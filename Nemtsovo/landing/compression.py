@@ -0,0 +1,144 @@
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+MIN_SIZE = 200
+CACHE_KEY = 'compressed:{}:{}'
+
+
+def get_accepted_encodings(accept_encoding):
+    accepted = set()
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(request):
+    accepted = get_accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress_body(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return compress_string(content)
+
+
+def compress_brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+    for item in sequence:
+        # flush после каждого куска, чтобы потоковый head не застревал в компрессоре
+        data = compressor.process(item) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def compress_gzip_sequence(sequence):
+    # django.utils.text.compress_sequence не делает flush, и потоковый head ждал бы конца страницы
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for item in sequence:
+        data = compressor.compress(item) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def is_cacheable(request, response):
+    cache_control = response.get('Cache-Control', '')
+    return request.method in ('GET', 'HEAD') \
+        and 'no-store' not in cache_control \
+        and 'private' not in cache_control \
+        and len(response.content) <= settings.COMPRESSION_CACHE_MAX_SIZE
+
+
+def get_compressed_content(request, response, encoding):
+    if not is_cacheable(request, response):
+        return compress_body(response.content, encoding)
+
+    # ключ - хеш самого тела, поэтому одинаковые ответы сжимаются один раз и чужое тело не отдастся
+    cache = caches[settings.COMPRESSION_CACHE_ALIAS]
+    cache_key = CACHE_KEY.format(encoding, hashlib.blake2b(response.content, digest_size=20).hexdigest())
+    compressed_content = cache.get(cache_key)
+    if compressed_content is None:
+        compressed_content = compress_body(response.content, encoding)
+        cache.set(cache_key, compressed_content, settings.COMPRESSION_CACHE_TIMEOUT)
+    return compressed_content
+
+
+def may_leak_secrets(request):
+    # BREACH: по размеру сжатого ответа можно подобрать секрет из тела, если рядом с ним отражается ввод
+    # атакующего (поиск ?q= в админке). Такие ответы не сжимаем: страницы, где в этом запросе
+    # брали csrf-токен (get_token ставит CSRF_COOKIE_NEEDS_UPDATE), и всю админку
+    return request.META.get('CSRF_COOKIE_NEEDS_UPDATE') or request.path.startswith(reverse('admin:index'))
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    # Как django.middleware.gzip.GZipMiddleware, но с brotli и кешем сжатых тел
+
+    def process_response(self, request, response):
+        if response.status_code != 200 or response.has_header('Content-Encoding'):
+            return response
+
+        if may_leak_secrets(request):
+            return response
+
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        if not response.streaming and len(response.content) < MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = choose_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if encoding == 'br':
+                response.streaming_content = compress_brotli_sequence(response.streaming_content)
+            else:
+                response.streaming_content = compress_gzip_sequence(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            try:
+                compressed_content = get_compressed_content(request, response, encoding)
+            except (zlib.error, getattr(brotli, 'error', zlib.error)):
+                return response
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response.headers['Content-Length'] = str(len(compressed_content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+
+        return response
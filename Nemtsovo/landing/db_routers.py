@@ -0,0 +1,76 @@
+import functools
+from asyncio import iscoroutinefunction
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+REPLICA_DB = 'replica'
+PRIMARY_DB = 'default'
+
+# состояние маршрутизации текущего запроса, создаётся в replica_routing_middleware
+_routing_state = ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    def __init__(self, replica_allowed):
+        self.replica_allowed = replica_allowed
+        self.use_replica = False
+        self.has_written = False
+
+
+def is_replica_configured():
+    return REPLICA_DB in settings.DATABASES
+
+
+# Чтение публичных страниц идёт в реплику, всё остальное (запись, админка, ErrorLog) - в основную БД.
+# После записи в рамках запроса читаем только из основной.
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if state and state.use_replica and not state.has_written and is_replica_configured():
+            return REPLICA_DB
+        return PRIMARY_DB
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state:
+            state.has_written = True
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+@contextmanager
+def use_routing_state(state):
+    # для кода, который выполняется уже после ответа middleware (генератор StreamingHttpResponse)
+    token = _routing_state.set(state)
+    try:
+        yield
+    finally:
+        _routing_state.reset(token)
+
+
+# помечает view как только читающую - её запросы пойдут в реплику
+def read_from_replica(view):
+    def mark_state():
+        state = _routing_state.get()
+        if state and state.replica_allowed:
+            state.use_replica = True
+
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            mark_state()
+            return await view(*args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            mark_state()
+            return view(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,199 @@
+import csv
+import re
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse, FileResponse
+from django.utils import timezone
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# в XML 1.0 нельзя управляющие символы, кроме табуляции и переводов строк
+XML_ILLEGAL_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# с этих символов Excel начинает формулу
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# телефон "+7 (900) 000-00-00": из цифр, скобок и минусов функцию не собрать, портить его апострофом незачем
+PHONE_RE = re.compile(r'^\+?[\d\s()-]+$')
+
+
+def format_date(value):
+    return timezone.localtime(value).strftime('%d.%m.%Y %H:%M') if value else ''
+
+
+def yes_no(value):
+    return 'да' if value else 'нет'
+
+
+def get_booking_name(booking):
+    name = booking.booking_identifier.name
+    return name + ' (посуточно)' if booking.is_dayly else name
+
+
+# общие поля Booking и ArchivedBooking
+BOOKING_COLUMNS = [
+    ('Что забронировано', get_booking_name),
+    ('ФИО', lambda booking: booking.fio),
+    ('Номер телефона', lambda booking: booking.phone_number),
+    ('Telegram', lambda booking: yes_no(booking.is_has_whatsapp)),
+    ('Взрослых', lambda booking: booking.adults_count),
+    ('Детей', lambda booking: booking.childs_count),
+    ('Желаемые даты', lambda booking: booking.desired_dates),
+    ('Ранний заезд', lambda booking: yes_no(booking.is_early_checkin)),
+    ('Поздний выезд', lambda booking: yes_no(booking.is_late_checkout)),
+    ('Статус', lambda booking: booking.get_status_display()),
+    ('Факт. начало', lambda booking: format_date(booking.date_start_fact)),
+    ('Факт. конец', lambda booking: format_date(booking.date_end_fact)),
+    ('Дата создания', lambda booking: format_date(booking.date_create)),
+    ('Комментарий клиента', lambda booking: booking.user_comment or ''),
+    ('Комментарий', lambda booking: booking.manager_comment or ''),
+]
+
+
+def iter_bookings(queryset):
+    # Пачки по первичному ключу, каждая читается через iterator(): mysqlclient без серверного курсора
+    # держит в памяти весь результат запроса, так что один iterator() на всю выборку памяти не сэкономит
+    chunk_size = settings.BOOKING_EXPORT_CHUNK_SIZE
+    queryset = queryset.select_related('booking_identifier').order_by('pk')
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        count = 0
+        for booking in batch[:chunk_size].iterator(chunk_size=chunk_size):
+            count += 1
+            last_pk = booking.pk
+            yield booking
+        if count < chunk_size:
+            return
+
+
+def escape_formula(value):
+    # ФИО, даты и комментарии приходят из публичной формы: "=HYPERLINK(...)" не должен стать формулой
+    # на компьютере менеджера, поэтому такие строки Excel получает как текст
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) and not PHONE_RE.match(value):
+        return "'" + value
+    return value
+
+
+def iter_rows(queryset, columns):
+    yield [header for header, getter in columns]
+    for booking in iter_bookings(queryset):
+        yield [getter(booking) for header, getter in columns]
+
+
+class StreamBuffer:
+    # write() копит байты, а генератор забирает их по мере готовности
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data if isinstance(data, bytes) else data.encode())
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_csv(rows):
+    # ; и BOM - чтобы русский Excel открыл файл без мастера импорта
+    buffer = StreamBuffer()
+    writer = csv.writer(buffer, delimiter=';')
+    yield '\ufeff'.encode()
+    for number, row in enumerate(rows, 1):
+        # в xlsx ячейки inlineStr формулами не бывают, экранировать нужно только csv
+        writer.writerow([escape_formula(value) for value in row])
+        if number % 1000 == 0:
+            yield buffer.pop()
+    yield buffer.pop()
+
+
+def get_xlsx_cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c t="n"><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(XML_ILLEGAL_RE.sub("", str(value)))}</t></is></c>'
+
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml':
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>',
+    '_rels/.rels':
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>',
+    'xl/workbook.xml':
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Заявки" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>',
+    'xl/_rels/workbook.xml.rels':
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>',
+}
+
+
+def stream_xlsx(rows):
+    # xlsx - это zip; zipfile умеет писать в поток без seek, поэтому лист собирается построчно
+    # и отдаётся по мере сжатия, без openpyxl и без файла целиком в памяти
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        yield buffer.pop()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            for number, row in enumerate(rows, 1):
+                sheet.write(('<row>' + ''.join(get_xlsx_cell(value) for value in row) + '</row>').encode())
+                if number % 1000 == 0:
+                    yield buffer.pop()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.pop()
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (stream_xlsx, XLSX_CONTENT_TYPE),
+}
+
+
+def export_bookings(request, queryset, export_format):
+    stream, content_type = EXPORT_FORMATS[export_format]
+    chunks = stream(iter_rows(queryset, BOOKING_COLUMNS))
+    filename = f'bookings-{timezone.localdate():%Y-%m-%d}.{export_format}'
+
+    if isinstance(request, ASGIRequest):
+        # ASGI в Django 4.1 перебирает потоковый ответ в event loop, где ORM запрещена, -
+        # собираем файл на диске во время запроса, память так же не растёт
+        file = tempfile.TemporaryFile()
+        for chunk in chunks:
+            file.write(chunk)
+        file.seek(0)
+        return FileResponse(file, as_attachment=True, filename=filename, content_type=content_type)
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
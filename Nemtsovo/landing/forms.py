@@ -1 +1,85 @@
-from django import forms
\ No newline at end of file
+from functools import partial
+
+from django import forms
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse_lazy
+
+from landing.models import MEASURE_CHOICES, Attachment
+from landing.uploads import UploadError, get_uploaded_file, remove_upload
+
+
+class ProductFilterForm(forms.Form):
+    AVAILABILITY_CHOICES = [
+        ('', 'Все'),
+        ('1', 'В наличии'),
+        ('0', 'Нет в наличии'),
+    ]
+
+    available = forms.TypedChoiceField(label='Наличие', choices=AVAILABILITY_CHOICES, coerce=lambda value: value == '1',
+                                       empty_value=None, required=False)
+    price_min = forms.IntegerField(label='Цена от', min_value=0, required=False)
+    price_max = forms.IntegerField(label='до', min_value=0, required=False)
+    measure = forms.ChoiceField(label='Ед. измерения', choices=[('', 'Любая')] + sorted(MEASURE_CHOICES),
+                                required=False)
+
+    def filter(self, queryset):
+        # неправильно заполненные поля просто не учитываются
+        self.is_valid()
+        data = self.cleaned_data
+
+        if data.get('available') is not None:
+            queryset = queryset.filter(is_available=data['available'])
+        if data.get('price_min') is not None:
+            queryset = queryset.filter(price__gte=data['price_min'])
+        if data.get('price_max') is not None:
+            queryset = queryset.filter(price__lte=data['price_max'])
+        if data.get('measure'):
+            queryset = queryset.filter(measure=data['measure'])
+        return queryset
+
+
+class AttachmentForm(forms.ModelForm):
+    # id файла, загруженного частями (landing.uploads): сам файл в форме тогда не отправляется
+    chunked_upload = forms.CharField(required=False, widget=forms.HiddenInput(attrs={
+        'class': 'chunked-upload',
+        'data-upload-url': reverse_lazy('chunked_upload'),
+        'data-chunk-size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+    }))
+
+    # кто отправляет форму - выставляет AttachmentInline.get_formset
+    user = None
+
+    class Meta:
+        model = Attachment
+        fields = '__all__'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # обязательность file проверяется в clean, с учётом загрузки частями
+        self.fields['file'].required = False
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload_id = cleaned_data.get('chunked_upload')
+        if upload_id:
+            try:
+                cleaned_data['file'] = get_uploaded_file(upload_id, self.user)
+            except UploadError as e:
+                self.add_error('file', str(e))
+        elif not cleaned_data.get('file'):
+            self.add_error('file', self.fields['file'].error_messages['required'])
+        return cleaned_data
+
+    def save(self, commit=True):
+        # загрузку удаляем, только когда запись с файлом точно сохранена
+        upload_id = self.cleaned_data.get('chunked_upload')
+        if upload_id:
+            transaction.on_commit(partial(self.finish_upload, self.cleaned_data['file'], upload_id))
+        return super().save(commit)
+
+    @staticmethod
+    def finish_upload(file, upload_id):
+        # файл мог открыться при оптимизации фото - закрываем, иначе дескриптор останется до сборки мусора
+        file.close()
+        remove_upload(upload_id)
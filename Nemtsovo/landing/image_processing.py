@@ -0,0 +1,102 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+ORIENTATION_TAG = 0x0112
+
+FORMAT_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'WEBP': '.webp',
+    'PNG': '.png',
+}
+
+
+class OptimizedImage:
+    def __init__(self, content, name, original_size, scale):
+        self.content = content
+        self.name = name
+        self.original_size = original_size
+        self.scale = scale
+
+    @property
+    def bytes_saved(self):
+        return self.original_size - self.content.size
+
+
+# Поворачивает фото по EXIF, убирает метаданные, уменьшает до UPLOAD_IMAGE_MAX_EDGE по длинной стороне
+# и пересохраняет в progressive JPEG или WebP. None - если это не фото или оптимизировать нечего
+def optimize_image(file):
+    file.seek(0)
+    try:
+        # Image.open читает только заголовок, так что видео целиком в память не попадёт
+        image = Image.open(file)
+        image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        # слишком большое фото (DecompressionBombError) тоже оставляем как есть
+        return None
+
+    # анимацию не трогаем
+    if getattr(image, 'is_animated', False):
+        return None
+
+    exif = image.getexif()
+    has_metadata = bool(exif)
+    # цветовой профиль оставляем, иначе у фото с телефонов поплывут цвета
+    icc_profile = image.info.get('icc_profile')
+    source_mode = image.mode
+    is_rotated = exif.get(ORIENTATION_TAG, 1) != 1
+    image = ImageOps.exif_transpose(image)
+
+    max_edge = settings.UPLOAD_IMAGE_MAX_EDGE
+    scale = 1
+    if max(image.size) > max_edge:
+        scale = max_edge / max(image.size)
+        image = image.resize((round(image.width * scale), round(image.height * scale)), Image.LANCZOS)
+
+    output_format = settings.UPLOAD_IMAGE_FORMAT
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if output_format == 'JPEG' and has_alpha:
+        # прозрачность в JPEG потеряется
+        output_format = 'PNG'
+    elif output_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif output_format == 'WEBP' and image.mode not in ('RGB', 'RGBA'):
+        # WebP всё равно сохранит в RGB/RGBA, конвертируем сами, чтобы знать о смене режима
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    if image.mode != source_mode:
+        # профиль описывает исходное цветовое пространство (например CMYK) и к RGB уже не подходит
+        icc_profile = None
+
+    buffer = io.BytesIO()
+    if output_format == 'JPEG':
+        image.save(buffer, 'JPEG', quality=settings.UPLOAD_IMAGE_QUALITY, optimize=True, progressive=True,
+                   icc_profile=icc_profile)
+    elif output_format == 'WEBP':
+        image.save(buffer, 'WEBP', quality=settings.UPLOAD_IMAGE_QUALITY, method=6, icc_profile=icc_profile)
+    else:
+        image.save(buffer, 'PNG', optimize=True, icc_profile=icc_profile)
+
+    data = buffer.getvalue()
+    original_size = file.size
+    if len(data) >= original_size and scale == 1 and not is_rotated and not has_metadata:
+        return None
+
+    name = os.path.splitext(os.path.basename(file.name))[0] + FORMAT_EXTENSIONS[output_format]
+    return OptimizedImage(ContentFile(data, name=name), name, original_size, scale)
+
+
+def scale_cropping(cropping, scale):
+    # координаты ImageRatioField ("x1,y1,x2,y2") заданы в пикселях исходного фото
+    if not cropping or scale == 1:
+        return cropping
+
+    try:
+        coordinates = [int(value) for value in cropping.split(',')]
+    except ValueError:
+        return cropping
+
+    return ','.join(str(round(value * scale)) for value in coordinates)
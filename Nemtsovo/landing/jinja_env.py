@@ -0,0 +1,44 @@
+import os
+
+from django.conf import settings
+from django.template import defaultfilters
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.timezone import template_localtime
+from image_cropping.templatetags.cropping import cropped_thumbnail as cropped_thumbnail_tag
+from jinja2 import Environment, FileSystemBytecodeCache
+
+
+def url(viewname, *args, **kwargs):
+    return reverse(viewname, args=args or None, kwargs=kwargs or None)
+
+
+def cropped_thumbnail(instance, ratiofieldname, **kwargs):
+    # тег image_cropping контекст шаблона не использует
+    return cropped_thumbnail_tag(None, instance, ratiofieldname, **kwargs)
+
+
+def date(value, arg=None):
+    # шаблоны Django переводят datetime в местное время сами, jinja2 - нет
+    return defaultfilters.date(template_localtime(value), arg)
+
+
+def environment(**options):
+    # Скомпилированные шаблоны кешируются на диске: новый воркер загружает байткод, а не разбирает шаблоны заново.
+    # Без JINJA2_BYTECODE_CACHE_DIR кеш лежит во временной папке пользователя
+    cache_dir = settings.JINJA2_BYTECODE_CACHE_DIR
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    env = Environment(bytecode_cache=FileSystemBytecodeCache(cache_dir), **options)
+    env.globals.update({
+        'static': static,
+        'url': url,
+        'cropped_thumbnail': cropped_thumbnail,
+    })
+    env.filters.update({
+        'date': date,
+        'truncatechars': defaultfilters.truncatechars,
+        'linebreaksbr': defaultfilters.linebreaksbr,
+    })
+    return env
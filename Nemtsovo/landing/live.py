@@ -0,0 +1,177 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from http.cookies import SimpleCookie
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from landing.models import Booking
+
+LIVE_BOOKINGS_PATH = '/admin/landing/booking/live'
+BATCH_SIZE = 50
+
+
+# Server-Sent Events с новыми и изменёнными заявками для списка заявок в админке.
+# Отдельное ASGI-приложение перед джанго: в Django 4.1 ASGI перебирает StreamingHttpResponse
+# прямо в event loop, и ожидание между событиями заблокировало бы все остальные запросы
+def live_bookings_app(django_app):
+    async def app(scope, receive, send):
+        if scope['type'] != 'http' or scope['path'].rstrip('/') != LIVE_BOOKINGS_PATH:
+            return await django_app(scope, receive, send)
+
+        headers = {name.decode('latin1').lower(): value.decode('latin1') for name, value in scope['headers']}
+        if not await sync_to_async(is_staff_session, thread_sensitive=False)(headers.get('cookie', '')):
+            return await send_plain(send, 403, b'Forbidden')
+
+        await stream_bookings(receive, send, get_last_event_cursor(headers.get('last-event-id')))
+
+    return app
+
+
+class _SessionRequest:
+    # get_user нужна только сессия
+    def __init__(self, session):
+        self.session = session
+
+
+def is_staff_session(cookie_header):
+    try:
+        cookies = SimpleCookie(cookie_header)
+        session_key = cookies[settings.SESSION_COOKIE_NAME].value if settings.SESSION_COOKIE_NAME in cookies else None
+        if not session_key:
+            return False
+
+        session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        user = get_user(_SessionRequest(session))
+        return user.is_active and user.is_staff
+    finally:
+        close_old_connections()
+
+
+def get_last_event_cursor(last_event_id):
+    # при переподключении EventSource присылает id последнего события "date_update|id" - продолжаем с него
+    try:
+        date_update, pk = last_event_id.rsplit('|', 1)
+        return datetime.fromisoformat(date_update), int(pk)
+    except (AttributeError, TypeError, ValueError):
+        return timezone.now(), 0
+
+
+def get_changed_bookings(cursor, sent):
+    # Курсор - (date_update, id): действия в админке ставят одну date_update всем выбранным заявкам,
+    # и по одной дате пачка из BATCH_SIZE потеряла бы остальные. Плюс заново просматриваем последние
+    # LIVE_BOOKINGS_OVERLAP_SECONDS до курсора: заявка, чья транзакция закоммитилась позже, могла
+    # получить date_update меньше уже отправленных. sent - уже отправленные (id, date_update) из этого окна
+    since, since_pk = cursor
+    try:
+        bookings = Booking.objects.select_related('booking_identifier').order_by('date_update', 'pk')
+        after_cursor = Q(date_update__gt=since) | Q(date_update=since, pk__gt=since_pk)
+        overlap_start = since - timedelta(seconds=settings.LIVE_BOOKINGS_OVERLAP_SECONDS)
+
+        late = [booking for booking in bookings.filter(~after_cursor, date_update__gte=overlap_start)
+                if (booking.pk, booking.date_update) not in sent]
+        changed = list(bookings.filter(after_cursor)[:BATCH_SIZE])
+        return [serialize_booking(booking) for booking in late], [serialize_booking(booking) for booking in changed]
+    finally:
+        close_old_connections()
+
+
+def serialize_booking(booking):
+    name = booking.booking_identifier.name
+    if booking.is_dayly:
+        name += ' (посуточно)'
+
+    return {
+        'id': booking.id,
+        'name': name,
+        'fio': booking.fio,
+        'phone_number': booking.phone_number,
+        'desired_dates': booking.desired_dates,
+        'status': booking.status,
+        'status_display': booking.get_status_display(),
+        'date_create': booking.date_create.isoformat(),
+        'date_update': booking.date_update.isoformat(),
+        'url': reverse('admin:landing_booking_change', args=[booking.id]),
+    }
+
+
+def format_event(booking):
+    data = json.dumps(booking, ensure_ascii=False)
+    return f"event: booking\nid: {booking['date_update']}|{booking['id']}\ndata: {data}\n\n".encode()
+
+
+async def send_plain(send, status, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'text/plain; charset=utf-8')],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def get_booking_key(booking):
+    return booking['id'], datetime.fromisoformat(booking['date_update'])
+
+
+async def stream_bookings(receive, send, cursor):
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            # nginx не должен копить ответ в буфере
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': f'retry: {int(settings.LIVE_BOOKINGS_POLL_SECONDS * 1000)}\n\n'.encode(),
+        'more_body': True,
+    })
+
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    loop = asyncio.get_running_loop()
+    last_sent_at = loop.time()
+    sent = set()
+    try:
+        while not disconnected.done():
+            late, changed = await sync_to_async(get_changed_bookings, thread_sensitive=False)(cursor, sent)
+            bookings = late + changed
+            if changed:
+                cursor = datetime.fromisoformat(changed[-1]['date_update']), changed[-1]['id']
+            if bookings:
+                sent.update(get_booking_key(booking) for booking in bookings)
+                # из окна перепроверки вышли - помнить их больше не нужно
+                overlap_start = cursor[0] - timedelta(seconds=settings.LIVE_BOOKINGS_OVERLAP_SECONDS)
+                sent = {key for key in sent if key[1] >= overlap_start}
+                body = b''.join(format_event(booking) for booking in bookings)
+            elif loop.time() - last_sent_at >= settings.LIVE_BOOKINGS_HEARTBEAT_SECONDS:
+                # комментарий держит соединение открытым через прокси
+                body = b': ping\n\n'
+            else:
+                body = None
+
+            if body:
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+                last_sent_at = loop.time()
+
+            # если пачка полная - сразу за следующей
+            if len(changed) < BATCH_SIZE:
+                await asyncio.wait([disconnected], timeout=settings.LIVE_BOOKINGS_POLL_SECONDS)
+    finally:
+        disconnected.cancel()
+
+
+async def wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
@@ -0,0 +1,51 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+from landing.models import Period, BookingIdentifier, House, WellnessTreatment, Action, OurProduct, Event, News, \
+    OurPet, AdditionalInfo, AdditionalInfoItem
+
+
+def seed_fixture_data(scale):
+    period, _ = Period.objects.get_or_create(singular='день', plural='дня', plural_special='дней')
+    info = AdditionalInfo.objects.create()
+    AdditionalInfoItem.objects.bulk_create(
+        AdditionalInfoItem(text=f'Пункт {i}', additional_info=info) for i in range(5))
+
+    identifiers = BookingIdentifier.objects.bulk_create(
+        BookingIdentifier(name=f'bench-{time.time_ns()}-{i}') for i in range(scale))
+
+    for model in (House, WellnessTreatment, Action):
+        model.objects.bulk_create(
+            model(name=f'{model.__name__} {i}', start_price=1000 * i, period=period, description='Описание ' * 20,
+                  additional_info=info, booking_identifier=identifiers[i], order=i)
+            for i in range(scale))
+
+    now = timezone.now()
+    OurProduct.objects.bulk_create(
+        OurProduct(name=f'Продукт {i}', price=100 + i, is_available=i % 3 != 0) for i in range(scale * 4))
+    Event.objects.bulk_create(
+        Event(title=f'Мероприятие {i}', description='Описание', date=now + timedelta(days=i - scale))
+        for i in range(scale * 2))
+    News.objects.bulk_create(News(title=f'Новость {i}', description='Текст ' * 50) for i in range(scale * 4))
+    OurPet.objects.bulk_create(OurPet(name=f'Питомец {i}', order=i) for i in range(scale))
+
+    return identifiers
+
+
+def percentile(values, percent):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def format_timings(name, timings, total_time):
+    return (f'{name}: {len(timings)} req, {len(timings) / total_time:.1f} req/s, '
+            f'mean {statistics.mean(timings) * 1000:.1f} ms, '
+            f'p50 {percentile(timings, 50) * 1000:.1f} ms, '
+            f'p95 {percentile(timings, 95) * 1000:.1f} ms, '
+            f'p99 {percentile(timings, 99) * 1000:.1f} ms')
@@ -0,0 +1,52 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from landing.models import Booking, ArchivedBooking
+
+
+class Command(BaseCommand):
+    help = 'Переносит завершённые и отменённые заявки старше горизонта в архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.BOOKING_ARCHIVE_AFTER_DAYS,
+                            help='Заявки, закончившиеся раньше скольких дней назад, уходят в архив')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--sleep', type=float, default=0.1, help='Пауза между пачками в секундах')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать')
+
+    def handle(self, *args, **options):
+        horizon = timezone.now() - timedelta(days=options['days'])
+
+        # подтверждённые - по фактическому выезду, а если его не указали, по дате заявки
+        finished = Q(status=Booking.APPROVED) & (
+            Q(date_end_fact__lt=horizon) | Q(date_end_fact__isnull=True, date_create__lt=horizon))
+        canceled = Q(status=Booking.CANCELED, date_create__lt=horizon)
+        to_archive = Booking.objects.filter(finished | canceled).order_by('pk')
+
+        if options['dry_run']:
+            self.stdout.write(f'К архивации: {to_archive.count()}')
+            return
+
+        archived = 0
+        while True:
+            with transaction.atomic():
+                batch = list(to_archive.select_for_update()[:options['batch_size']])
+                if not batch:
+                    break
+
+                ArchivedBooking.objects.bulk_create(
+                    [ArchivedBooking.from_booking(booking) for booking in batch],
+                    ignore_conflicts=True)
+                Booking.objects.filter(pk__in=[booking.pk for booking in batch]).delete()
+
+            archived += len(batch)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Перенесено в архив: {archived}'))
@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from landing.management.bench_utils import format_timings
+from landing.sqlite_tuning import get_pragma_statements
+
+SCHEMA = '''
+CREATE TABLE booking (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    booking_identifier_id INTEGER NOT NULL,
+    fio VARCHAR(100) NOT NULL,
+    phone_number VARCHAR(20) NOT NULL,
+    desired_dates VARCHAR(400) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    date_create DATETIME NOT NULL
+)
+'''
+CREATE_INDEX = 'CREATE INDEX booking_identifier_idx ON booking (booking_identifier_id)'
+INSERT_BOOKING = '''
+INSERT INTO booking (booking_identifier_id, fio, phone_number, desired_dates, status, date_create)
+VALUES (?, ?, ?, ?, 'a', datetime('now'))
+'''
+SELECT_BOOKED = "SELECT desired_dates FROM booking WHERE booking_identifier_id = ? AND status = 'b'"
+
+
+def run_worker(path, pragmas, worker_id, operations, read_ratio):
+    # как в Django: autocommit, таймаут sqlite3 по умолчанию 5 секунд
+    connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+    for statement in get_pragma_statements(pragmas):
+        connection.execute(statement)
+
+    timings, errors = [], 0
+    for i in range(operations):
+        started = time.perf_counter()
+        try:
+            if i % 100 < read_ratio:
+                connection.execute(SELECT_BOOKED, (i % 10,)).fetchall()
+            else:
+                connection.execute(INSERT_BOOKING, (i % 10, f'Иванов {worker_id}', '81234567890', '01.07.2025'))
+        except sqlite3.OperationalError:
+            errors += 1
+            continue
+        timings.append(time.perf_counter() - started)
+
+    connection.close()
+    return timings, errors
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает конкурентную запись в SQLite с настройками по умолчанию и с SQLITE_PRAGMAS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Кол-во процессов (как воркеров сервера)')
+        parser.add_argument('--operations', type=int, default=500, help='Операций на процесс')
+        parser.add_argument('--read-ratio', type=int, default=50, help='Процент чтений среди операций')
+
+    def handle(self, *args, **options):
+        profiles = {
+            'default': {},
+            'tuned': settings.SQLITE_PRAGMAS or {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+        }
+
+        for name, pragmas in profiles.items():
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                total_time, timings, errors = self.run_profile(path, pragmas, options)
+
+            self.stdout.write(format_timings(name, timings, total_time) + f', errors {errors}')
+
+    def run_profile(self, path, pragmas, options):
+        connection = sqlite3.connect(path)
+        connection.execute(SCHEMA)
+        connection.execute(CREATE_INDEX)
+        connection.commit()
+        connection.close()
+
+        args = [(path, pragmas, worker_id, options['operations'], options['read_ratio'])
+                for worker_id in range(options['workers'])]
+
+        started = time.perf_counter()
+        with multiprocessing.Pool(options['workers']) as pool:
+            results = pool.starmap(run_worker, args)
+        total_time = time.perf_counter() - started
+
+        timings = [timing for worker_timings, _ in results for timing in worker_timings]
+        errors = sum(worker_errors for _, worker_errors in results)
+        return total_time, timings, errors
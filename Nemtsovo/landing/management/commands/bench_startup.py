@@ -0,0 +1,71 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from landing.warmup import warm_up
+
+# строка вывода -X importtime: "import time:       self [us] |  cumulative | imported package"
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+\d+\s+\|\s*(\S+)')
+
+
+class Command(BaseCommand):
+    help = 'Измеряет время запуска воркера: импорты (python -X importtime) и этапы прогрева'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='Nemtsovo.wsgi',
+                            help='Что импортировать: Nemtsovo.wsgi или Nemtsovo.asgi')
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=15, help='Сколько самых дорогих пакетов показать')
+        parser.add_argument('--warm-up', action='store_true', help='Прогревать воркер при импорте (WARMUP_ON_START)')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'WARMUP_ON_START': '1' if options['warm_up'] else ''}
+        wall_times = []
+        import_times = {}
+
+        for _ in range(options['runs']):
+            started_at = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', f"import {options['module']}"],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+            wall_times.append(time.perf_counter() - started_at)
+
+            if result.returncode:
+                self.stderr.write(result.stderr[-2000:])
+                return
+
+            for package, microseconds in parse_importtime(result.stderr).items():
+                import_times.setdefault(package, []).append(microseconds)
+
+        self.stdout.write(f"{options['module']}: запуск {statistics.median(wall_times) * 1000:.0f} ms "
+                          f"(медиана из {options['runs']}, прогрев {'вкл' if options['warm_up'] else 'выкл'})")
+
+        self.stdout.write('Самые дорогие пакеты (время импорта своих модулей, медиана):')
+        medians = sorted(((statistics.median(values), package) for package, values in import_times.items()),
+                         reverse=True)
+        for microseconds, package in medians[:options['top']]:
+            self.stdout.write(f'  {microseconds / 1000:8.1f} ms  {package}')
+
+        self.stdout.write('Этапы прогрева в этом процессе:')
+        for stage, seconds in warm_up().items():
+            self.stdout.write(f'  {seconds * 1000:8.1f} ms  {stage}')
+
+
+# собственное (self) время импорта по корневым пакетам в микросекундах: cumulative у верхнего уровня
+# почти целиком приходится на Nemtsovo, который импортирует всё остальное
+def parse_importtime(output):
+    packages = {}
+    for line in output.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        self_time, package = match.groups()
+        root = package.split('.')[0]
+        packages[root] = packages.get(root, 0) + int(self_time)
+    return packages
@@ -0,0 +1,79 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+from django.test import RequestFactory
+
+from landing.management.bench_utils import seed_fixture_data, format_timings
+from landing.views import get_index_querysets, get_events_querysets, get_news_page, get_products_context
+
+PAGES = {
+    'index': ('/', 'landing/index.html', lambda request: get_index_querysets()),
+    'events': ('/events', 'landing/events.html', lambda request: get_events_querysets()),
+    'news': ('/news', 'landing/news.html', lambda request: {'news': get_news_page(request)}),
+    'products': ('/products', 'landing/our-products.html', get_products_context),
+}
+
+
+def get_engines():
+    try:
+        from django.template.backends.jinja2 import Jinja2
+    except ImportError:
+        raise CommandError('Для сравнения нужен jinja2 (pip install Jinja2)')
+
+    # jinja2 может быть и не включён в TEMPLATES (JINJA2_TEMPLATES) - тогда собираем движок здесь
+    jinja2_engine = next((engine for engine in engines.all() if isinstance(engine, Jinja2)), None)
+    if jinja2_engine is None:
+        params = {name: value for name, value in settings.JINJA2_BACKEND.items() if name != 'BACKEND'}
+        jinja2_engine = Jinja2({**params, 'NAME': 'jinja2'})
+    return {'django': engines['django'], 'jinja2': jinja2_engine}
+
+
+def normalize(html):
+    # шаблоны расходятся только пробелами, переводами строк и тем, как экранирован апостроф
+    return ' '.join(html.replace('&#x27;', '&#39;').split())
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает рендер публичных страниц шаблонами Django и Jinja2 на одних и тех же данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', choices=list(PAGES), nargs='+', default=list(PAGES))
+        parser.add_argument('--renders', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Сначала создать тестовые данные указанного масштаба (пишет в текущую БД!)')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seed_fixture_data(options['seed'])
+
+        template_engines = get_engines()
+        factory = RequestFactory()
+
+        for page in options['page']:
+            path, template_name, get_context = PAGES[page]
+            request = factory.get(path)
+            request.user = AnonymousUser()
+            # querysets вычисляем заранее: сравнивается рендер, а не запросы к БД
+            context = {name: list(value) if hasattr(value, '_fetch_all') else value
+                       for name, value in get_context(request).items()}
+
+            outputs = {}
+            for engine_name, engine in template_engines.items():
+                template = engine.get_template(template_name)
+                outputs[engine_name] = template.render(context, request)
+
+                timings = []
+                started = time.perf_counter()
+                for _ in range(options['renders']):
+                    render_started = time.perf_counter()
+                    template.render(context, request)
+                    timings.append(time.perf_counter() - render_started)
+                total_time = time.perf_counter() - started
+
+                self.stdout.write(format_timings(f'{page} {engine_name}', timings, total_time))
+
+            if normalize(outputs['django']) != normalize(outputs['jinja2']):
+                self.stderr.write(f'{page}: html шаблонов Django и Jinja2 различается')
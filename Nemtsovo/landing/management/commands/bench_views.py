@@ -0,0 +1,78 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import RequestFactory, AsyncRequestFactory
+
+import landing.views
+from landing.management.bench_utils import seed_fixture_data, format_timings
+
+VIEWS = {
+    'index': ('/', landing.views.index, landing.views.index_async),
+    'events': ('/events', landing.views.events, landing.views.events_async),
+    'news': ('/news', landing.views.news, landing.views.news_async),
+    'products': ('/products', landing.views.our_products, landing.views.our_products_async),
+}
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает sync и async версии публичных страниц под конкурентной нагрузкой'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', choices=list(VIEWS), default='index')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Сначала создать тестовые данные указанного масштаба (пишет в текущую БД!)')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seed_fixture_data(options['seed'])
+
+        path, sync_view, async_view = VIEWS[options['page']]
+        count, concurrency = options['requests'], options['concurrency']
+
+        # прогрев: шаблоны, url-ы, соединение
+        self.run_sync(path, sync_view, 1, 1)
+
+        total_time, timings = self.run_sync(path, sync_view, count, concurrency)
+        self.stdout.write(format_timings(f'sync  x{concurrency}', timings, total_time))
+
+        total_time, timings = asyncio.run(self.run_async(path, async_view, count, concurrency))
+        self.stdout.write(format_timings(f'async x{concurrency}', timings, total_time))
+
+    def run_sync(self, path, view, count, concurrency):
+        factory = RequestFactory()
+
+        def call(_):
+            request = factory.get(path)
+            request.user = AnonymousUser()
+            started = time.perf_counter()
+            view(request)
+            elapsed = time.perf_counter() - started
+            close_old_connections()
+            return elapsed
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            timings = list(executor.map(call, range(count)))
+        return time.perf_counter() - started, timings
+
+    async def run_async(self, path, view, count, concurrency):
+        factory = AsyncRequestFactory()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call():
+            async with semaphore:
+                request = factory.get(path)
+                request.user = AnonymousUser()
+                started = time.perf_counter()
+                await view(request)
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        timings = await asyncio.gather(*(call() for _ in range(count)))
+        return time.perf_counter() - started, timings
@@ -0,0 +1,45 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from landing import static_export
+from landing.models import Attachment
+from landing.storage import ContentAddressedStorage, is_content_addressed
+
+
+class Command(BaseCommand):
+    help = 'Переносит уже загруженные Фото/Видео в content-addressed хранилище, объединяя одинаковые файлы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-old', action='store_true', help='Удалять старые файлы после переноса')
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            raise CommandError('Включите MEDIA_CONTENT_ADDRESSED')
+
+        moved, saved_bytes, seen = 0, 0, set()
+        for attachment in Attachment.objects.order_by('pk').iterator():
+            old_name = attachment.file.name
+            if is_content_addressed(old_name) or not default_storage.exists(old_name):
+                continue
+
+            size = default_storage.size(old_name)
+            with default_storage.open(old_name) as old_file:
+                new_name = default_storage.save(old_name, old_file)
+
+            if new_name in seen:
+                saved_bytes += size
+            seen.add(new_name)
+
+            # update, чтобы не вызывать save() модели и не трогать кроп
+            Attachment.objects.filter(pk=attachment.pk).update(file=new_name)
+            if options['delete_old']:
+                default_storage.delete(old_name)
+
+            moved += 1
+            self.stdout.write(f'{old_name} -> {new_name}')
+
+        # url-ы поменялись - перерисовываем выгруженные страницы
+        if moved and static_export.get_export_root():
+            static_export.export_pages()
+
+        self.stdout.write(self.style.SUCCESS(f'Перенесено: {moved}, сэкономлено за счёт дублей: {saved_bytes} байт'))
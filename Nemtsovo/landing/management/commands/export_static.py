@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from landing import static_export
+
+
+class Command(BaseCommand):
+    help = 'Рендерит публичные страницы в html (+ .gz/.br) для отдачи фронтовым сервером без Django'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page',
+            action='append',
+            choices=list(static_export.PAGES),
+            help='Какие страницы перерисовать (по умолчанию все)')
+        parser.add_argument('--output', help='Каталог для файлов (по умолчанию STATIC_EXPORT_ROOT)')
+        parser.add_argument(
+            '--passed-events',
+            action='store_true',
+            help='Перерисовать только страницы, на которых с прошлого экспорта прошло событие (для cron)')
+
+    def handle(self, *args, **options):
+        root = options['output'] or static_export.get_export_root()
+        if not root:
+            raise CommandError('Укажите --output или STATIC_EXPORT_ROOT в настройках')
+
+        if static_export.brotli is None:
+            self.stderr.write('brotli не установлен, .br файлы не будут созданы')
+
+        pages = options['page']
+        if options['passed_events']:
+            pages = static_export.get_pages_with_passed_events(root)
+            if not pages:
+                self.stdout.write('Прошедших событий нет, страницы актуальны')
+                return
+
+        written = static_export.export_pages(pages, root)
+        for filename in written:
+            self.stdout.write(filename)
+
+        self.stdout.write(self.style.SUCCESS(f'Готово: {len(written)} стр. в {root}'))
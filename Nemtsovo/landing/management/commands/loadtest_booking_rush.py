@@ -0,0 +1,424 @@
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from landing.management.bench_utils import seed_fixture_data, format_timings, percentile
+from landing.models import BookingIdentifier, Booking, Notification, ErrorLog
+
+PAGES = ['/', '/events', '/news', '/products']
+STEPS = ['page', 'availability', 'booking']
+# по этому ФИО заявки теста находятся и удаляются после прогона
+LOADTEST_FIO = 'Нагрузочный тест'
+# SQLite: database is locked / database table is locked; MySQL: Lock wait timeout exceeded / Deadlock found
+LOCK_ERROR_RE = re.compile(r'locked|lock wait timeout|deadlock', re.IGNORECASE)
+SERVER_START_TIMEOUT = 30
+# опции, которые при --compare передаются прогонам для каждой БД
+PASSED_OPTIONS = ['sessions', 'concurrency', 'booking_ratio', 'think_time', 'ramp_up', 'server', 'workers',
+                  'timeout', 'seed']
+
+
+class HttpClient:
+    # минимальный HTTP/1.1 клиент с keep-alive и cookie: у каждого посетителя своё соединение и свой csrftoken
+
+    def __init__(self, host, port, host_header, timeout):
+        self.host = host
+        self.port = port
+        self.host_header = host_header
+        self.timeout = timeout
+        self.cookies = {}
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=b'', headers=None):
+        return await asyncio.wait_for(self._request(method, path, body, headers or {}), self.timeout)
+
+    async def _request(self, method, path, body, headers):
+        reused = self.writer is not None
+        if not reused:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host_header}', f'Content-Length: {len(body)}']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{name}={value}' for name, value in self.cookies.items()))
+
+        try:
+            self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+            await self.writer.drain()
+            return await self._read_response()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            await self.close()
+            if not reused:
+                raise
+        # сервер успел закрыть keep-alive соединение - повторяем на новом
+        return await self._request(method, path, body, headers)
+
+    async def _read_response(self):
+        status = int((await self.reader.readuntil(b'\r\n')).split()[1])
+        headers = {}
+        while True:
+            line = (await self.reader.readuntil(b'\r\n')).decode('latin-1')
+            if line == '\r\n':
+                break
+            name, _, value = line.partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                cookie_name, _, cookie_value = value.split(';')[0].partition('=')
+                self.cookies[cookie_name.strip()] = cookie_value.strip()
+            else:
+                headers[name] = value
+
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked()
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            body, keep_alive = await self.reader.read(), False
+
+        if not keep_alive:
+            await self.close()
+        return status, body
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            if not size:
+                # завершающие заголовки не используются
+                while await self.reader.readuntil(b'\r\n') != b'\r\n':
+                    pass
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = self.reader = None
+
+
+def get_error_kind(status, body):
+    if status < 400:
+        return None
+    if status == 429:
+        return 'rate_limited'
+    if status >= 500 and LOCK_ERROR_RE.search(body.decode('utf-8', 'replace')):
+        return 'db_lock'
+    return f'http_{status}'
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class ServerProcess:
+    # сервер в отдельном процессе, чтобы генератор нагрузки не делил с ним GIL
+
+    def __init__(self, command, env, port):
+        self.command = command
+        self.env = env
+        self.port = port
+        self.process = None
+        self.log = None
+
+    def __enter__(self):
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(self.command, cwd=settings.BASE_DIR, env=self.env,
+                                        stdout=subprocess.DEVNULL, stderr=self.log)
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                self.log.seek(0)
+                raise CommandError('Сервер не запустился:\n' + self.log.read()[-2000:].decode('utf-8', 'replace'))
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return f'http://127.0.0.1:{self.port}'
+            except OSError:
+                time.sleep(0.2)
+
+        self.__exit__()
+        raise CommandError(f'Сервер не открыл порт {self.port} за {SERVER_START_TIMEOUT} s')
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+
+class LoadRun:
+
+    def __init__(self, host, port, identifiers, options):
+        self.host = host
+        self.port = port
+        self.host_header = settings.ALLOWED_HOSTS[0].replace('*', 'localhost')
+        self.identifiers = identifiers
+        self.options = options
+        self.timings = {name: [] for name in STEPS}
+        self.errors = {name: Counter() for name in STEPS}
+        self.next_session = 0
+
+    async def run(self):
+        # прогрев: первый запрос к каждой странице компилирует шаблоны и открывает соединения с БД
+        client = self.get_client()
+        for path in PAGES:
+            await client.request('GET', path)
+        await client.close()
+
+        started = time.perf_counter()
+        concurrency = self.options['concurrency']
+        await asyncio.gather(*(self.visitor(number * self.options['ramp_up'] / concurrency)
+                               for number in range(concurrency)))
+        total_time = time.perf_counter() - started
+
+        return {
+            'total_time': total_time,
+            'steps': {name: {'timings': self.timings[name], 'errors': dict(self.errors[name])} for name in STEPS},
+        }
+
+    def get_client(self):
+        return HttpClient(self.host, self.port, self.host_header, self.options['timeout'])
+
+    async def visitor(self, delay):
+        await asyncio.sleep(delay)
+        # каждый «одновременный посетитель» проходит сценарии, пока не кончатся сессии
+        while self.next_session < self.options['sessions']:
+            number = self.next_session
+            self.next_session += 1
+            client = self.get_client()
+            try:
+                await self.session(client, number, random.Random(number))
+            finally:
+                await client.close()
+
+    async def session(self, client, number, rnd):
+        if not await self.step('page', client, 'GET', rnd.choice(PAGES)):
+            return
+        await self.think(rnd)
+
+        identifier = rnd.choice(self.identifiers)
+        is_dayly = rnd.random() < 0.5
+        path = f'/get-booked-days/{identifier}' + ('' if is_dayly else '?only_dayly=1')
+        if not await self.step('availability', client, 'GET', path):
+            return
+        if rnd.randrange(100) >= self.options['booking_ratio']:
+            return
+        await self.think(rnd)
+
+        body = json.dumps({
+            'fio': f'{LOADTEST_FIO} {number}',
+            'phone': '81234567890',
+            'adults': 2,
+            'childrens': 0,
+            'desired_dates': '01.07.2025 - 03.07.2025',
+            'whatsapp': False,
+            'booking_identifier': identifier,
+            'is_dayly': is_dayly,
+            'comment': '',
+        }).encode()
+        headers = {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': client.cookies.get(settings.CSRF_COOKIE_NAME, ''),
+        }
+        await self.step('booking', client, 'POST', '/add-booking', body, headers)
+
+    async def step(self, name, client, method, path, body=b'', headers=None):
+        started = time.perf_counter()
+        try:
+            status, response_body = await client.request(method, path, body, headers)
+        except asyncio.TimeoutError:
+            self.errors[name]['timeout'] += 1
+            return False
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+            self.errors[name]['connection'] += 1
+            return False
+
+        error_kind = get_error_kind(status, response_body)
+        if error_kind:
+            self.errors[name][error_kind] += 1
+            return False
+        self.timings[name].append(time.perf_counter() - started)
+        return True
+
+    async def think(self, rnd):
+        if self.options['think_time']:
+            await asyncio.sleep(rnd.uniform(0, self.options['think_time']))
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест "открытие сезона": посетители одновременно открывают страницу, проверяют '
+            'занятые даты и отправляют заявки. Поднимает локальный сервер (WSGI или ASGI) на текущей БД. '
+            'Заявки теста удаляются после прогона, записи ErrorLog остаются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=300, help='Сколько посетителей пройдёт сценарий')
+        parser.add_argument('--concurrency', type=int, default=50, help='Сколько посетителей одновременно')
+        parser.add_argument('--booking-ratio', type=int, default=30,
+                            help='Процент посетителей, которые отправляют заявку')
+        parser.add_argument('--think-time', type=float, default=0,
+                            help='Пауза между шагами сценария в секундах (случайная, до указанной)')
+        parser.add_argument('--ramp-up', type=float, default=0,
+                            help='За сколько секунд подключаются все посетители (0 - все сразу)')
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi',
+                            help='wsgi - gunicorn, если установлен, иначе runserver; asgi - uvicorn')
+        parser.add_argument('--workers', type=int, default=4, help='Процессов сервера (gunicorn, uvicorn)')
+        parser.add_argument('--url', help='Не поднимать сервер, а нагружать уже запущенный (http://host:port); '
+                                             'заявки теста останутся в БД этого сервера')
+        parser.add_argument('--keep-rate-limits', action='store_true',
+                            help='Не отключать RATE_LIMITS у поднятого сервера (все посетители с одного IP)')
+        parser.add_argument('--timeout', type=float, default=30, help='Таймаут запроса в секундах')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Сначала создать тестовые данные указанного масштаба (пишет в текущую БД!)')
+        parser.add_argument('--compare', nargs='+', choices=['sqlite', 'mysql'],
+                            help='Прогнать тест на каждой БД (mysql - через USE_MYSQL и MYSQL_*) и сравнить')
+        parser.add_argument('--json-output', help='Сохранить итоги в JSON')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            self.compare(options)
+            return
+
+        if options['seed']:
+            seed_fixture_data(options['seed'])
+
+        identifiers = list(BookingIdentifier.objects.values_list('id', flat=True))
+        if not identifiers:
+            raise CommandError('В БД нет BookingIdentifier - запустите с --seed')
+        if settings.DEBUG:
+            self.stderr.write('DEBUG включён: сервер будет заметно медленнее, чем в продакшене')
+
+        if options['url']:
+            results = self.run_load(options['url'], identifiers, options)
+        else:
+            with self.start_server(options) as url:
+                results = self.run_load(url, identifiers, options)
+
+        self.report(results, options)
+        if options['json_output']:
+            with open(options['json_output'], 'w') as file:
+                json.dump(results, file)
+
+    def start_server(self, options):
+        port = get_free_port()
+        # заявки теста не должны попасть в очередь уведомлений и уйти адресатам
+        env = {**os.environ, 'NOTIFICATIONS_DISABLED': '1'}
+        if not options['keep_rate_limits']:
+            env['RATE_LIMIT_DISABLED'] = '1'
+
+        if options['server'] == 'asgi':
+            if importlib.util.find_spec('uvicorn') is None:
+                raise CommandError('Для --server asgi нужен uvicorn (pip install uvicorn)')
+            command = [sys.executable, '-m', 'uvicorn', 'Nemtsovo.asgi:application', '--host', '127.0.0.1',
+                       '--port', str(port), '--workers', str(options['workers']), '--no-access-log']
+        elif importlib.util.find_spec('gunicorn') is not None:
+            command = [sys.executable, '-m', 'gunicorn', 'Nemtsovo.wsgi:application', '--bind',
+                       f'127.0.0.1:{port}', '--workers', str(options['workers']), '--threads', '4']
+        else:
+            # runserver - один процесс с потоком на запрос, --workers не учитывается
+            command = [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}']
+
+        return ServerProcess(command, env, port)
+
+    def run_load(self, url, identifiers, options):
+        match = re.match(r'^http://([^/:]+)(?::(\d+))?/?$', url)
+        if not match:
+            raise CommandError('--url должен быть вида http://host:port')
+        host, port = match.group(1), int(match.group(2) or 80)
+
+        started_at = timezone.now()
+        results = asyncio.run(LoadRun(host, port, identifiers, options).run())
+
+        if options['url']:
+            # у чужого сервера может быть другая БД - ни убирать за тестом, ни считать по ErrorLog здесь нельзя
+            self.stderr.write(f'Заявки теста (ФИО "{LOADTEST_FIO}...") и их уведомления остались в БД сервера '
+                              f'{url}, удалите их там; блокировки в ErrorLog не посчитаны')
+            results['lock_errors_logged'] = None
+        else:
+            # заявки теста удаляем, ошибки в журнале оставляем - по ним видно, что именно падало
+            Booking.objects.filter(fio__startswith=LOADTEST_FIO).delete()
+            Notification.objects.filter(body__contains=f'ФИО: {LOADTEST_FIO}').delete()
+            results['lock_errors_logged'] = ErrorLog.objects.filter(date__gte=started_at).filter(
+                Q(error_message__icontains='locked') | Q(error_message__icontains='lock wait timeout')
+                | Q(error_message__icontains='deadlock')).count()
+        results['database'] = connection.vendor
+        results['server'] = options['server'] if not options['url'] else url
+        return results
+
+    def report(self, results, options):
+        total_requests = sum(len(step['timings']) + sum(step['errors'].values()) for step in results['steps'].values())
+        self.stdout.write(f"БД: {results['database']}, сервер: {results['server']}, "
+                          f"{options['sessions']} посетителей, {options['concurrency']} одновременно, "
+                          f"{results['total_time']:.1f} s")
+        self.stdout.write(f"Всего: {total_requests} запросов, {total_requests / results['total_time']:.1f} req/s, "
+                          f"{options['sessions'] / results['total_time']:.1f} посетителей/s")
+
+        for name, step in results['steps'].items():
+            line = format_timings(name, step['timings'], results['total_time']) if step['timings'] else f'{name}: -'
+            errors = sum(step['errors'].values())
+            attempts = len(step['timings']) + errors
+            if errors:
+                details = ', '.join(f'{kind} {count}' for kind, count in sorted(step['errors'].items()))
+                line += f', ошибки {errors / attempts:.1%} ({details})'
+            self.stdout.write(line)
+
+        lock_responses = sum(step['errors'].get('db_lock', 0) for step in results['steps'].values())
+        line = f"Блокировки БД: {lock_responses} ответов с ошибкой блокировки"
+        if results['lock_errors_logged'] is not None:
+            line += f", {results['lock_errors_logged']} записей в ErrorLog"
+        self.stdout.write(line)
+
+    def compare(self, options):
+        args = []
+        for name in PASSED_OPTIONS:
+            args += [f"--{name.replace('_', '-')}", str(options[name])]
+        if options['keep_rate_limits']:
+            args.append('--keep-rate-limits')
+
+        summary = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for database in options['compare']:
+                self.stdout.write(self.style.MIGRATE_HEADING(f'== {database}'))
+                output = os.path.join(directory, f'{database}.json')
+                env = {**os.environ, 'USE_MYSQL': '1' if database == 'mysql' else ''}
+                result = subprocess.run([sys.executable, 'manage.py', 'loadtest_booking_rush', *args,
+                                         '--json-output', output], cwd=settings.BASE_DIR, env=env)
+                if result.returncode:
+                    self.stderr.write(f'Прогон на {database} завершился с ошибкой')
+                    continue
+                with open(output) as file:
+                    summary[database] = json.load(file)
+
+        if len(summary) < 2:
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING('== Сравнение (p95 ms / ошибки)'))
+        self.stdout.write('шаг'.ljust(14) + ''.join(database.rjust(20) for database in summary))
+        for name in STEPS:
+            cells = []
+            for results in summary.values():
+                step = results['steps'][name]
+                errors = sum(step['errors'].values())
+                cells.append(f"{percentile(step['timings'], 95) * 1000:.1f} / {errors}".rjust(20))
+            self.stdout.write(name.ljust(14) + ''.join(cells))
+        self.stdout.write('посетителей/s'.ljust(14) + ''.join(
+            f"{options['sessions'] / results['total_time']:.1f}".rjust(20) for results in summary.values()))
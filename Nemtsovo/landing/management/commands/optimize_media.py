@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from landing import static_export
+from landing.image_processing import optimize_image, scale_cropping
+from landing.models import Attachment
+
+
+class Command(BaseCommand):
+    help = 'Оптимизирует уже загруженные фото так же, как при загрузке, и показывает сколько места сэкономлено'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, файлы не менять')
+        parser.add_argument('--delete-old', action='store_true', help='Удалять исходные файлы после замены')
+
+    def handle(self, *args, **options):
+        total_before, total_after, replaced = 0, 0, 0
+
+        for attachment in Attachment.objects.order_by('pk').iterator():
+            if attachment.is_video() or not attachment.file.storage.exists(attachment.file.name):
+                continue
+
+            with attachment.file.open('rb') as file:
+                optimized = optimize_image(file)
+
+            if optimized is None or optimized.bytes_saved <= 0:
+                continue
+
+            total_before += optimized.original_size
+            total_after += optimized.content.size
+            self.stdout.write(
+                f'{attachment.file.name}: {optimized.original_size} -> {optimized.content.size} байт '
+                f'(-{optimized.bytes_saved * 100 // optimized.original_size}%)')
+
+            if options['dry_run']:
+                continue
+
+            old_name = attachment.file.name
+            storage = attachment.file.storage
+            attachment.file.save(optimized.name, optimized.content, save=False)
+            # update, чтобы не запускать оптимизацию в save() ещё раз
+            Attachment.objects.filter(pk=attachment.pk).update(
+                file=attachment.file.name,
+                miniature=scale_cropping(attachment.miniature, optimized.scale))
+            if options['delete_old'] and old_name != attachment.file.name:
+                storage.delete(old_name)
+            replaced += 1
+
+        if replaced and static_export.get_export_root():
+            static_export.export_pages()
+
+        saved = total_before - total_after
+        self.stdout.write(self.style.SUCCESS(
+            f'Итого: {total_before} -> {total_after} байт, сэкономлено {saved} байт, заменено файлов: {replaced}'))
@@ -0,0 +1,79 @@
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from landing.models import ErrorLog, ErrorLogDailyCount
+
+
+class Command(BaseCommand):
+    help = 'Считает ошибки по дням и удаляет решённые и старые записи ErrorLog небольшими пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solved-days', type=int, default=settings.ERROR_LOG_SOLVED_RETENTION_DAYS,
+                            help='Сколько дней хранить решённые ошибки')
+        parser.add_argument('--max-days', type=int, default=settings.ERROR_LOG_RETENTION_DAYS,
+                            help='Сколько дней хранить любые ошибки')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.1,
+                            help='Пауза между пачками в секундах, чтобы не мешать записи')
+
+    def handle(self, *args, **options):
+        today_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        rolled_up = self.rollup_daily_counts(today_start)
+        self.stdout.write(f'Посчитано дней: {rolled_up}')
+
+        # удаляем только за уже посчитанные дни, то есть не позже начала сегодняшнего
+        solved_before = min(today_start, timezone.now() - timedelta(days=options['solved_days']))
+        expired_before = min(today_start, timezone.now() - timedelta(days=options['max_days']))
+        expired = ErrorLog.objects.filter(Q(is_solved=True, date__lt=solved_before) | Q(date__lt=expired_before))
+
+        deleted = 0
+        while True:
+            batch_ids = list(expired.order_by('pk').values_list('pk', flat=True)[:options['batch_size']])
+            if not batch_ids:
+                break
+
+            with transaction.atomic():
+                deleted += ErrorLog.objects.filter(pk__in=batch_ids).delete()[0]
+
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей: {deleted}'))
+
+    def rollup_daily_counts(self, today_start):
+        last_day = ErrorLogDailyCount.objects.aggregate(last_day=Max('day'))['last_day']
+        if last_day is None:
+            first_error = ErrorLog.objects.order_by('date').values_list('date', flat=True).first()
+            if first_error is None:
+                return 0
+            day = timezone.localtime(first_error).date()
+        else:
+            day = last_day + timedelta(days=1)
+
+        # По одному дню за раз, чтобы группировка не шла по всей таблице.
+        # День задаём диапазоном дат, а не date__date: тот на MySQL превращается в CONVERT_TZ,
+        # не использует индекс по date и без таблиц часовых поясов молча ничего не находит
+        days = 0
+        while day < today_start.date():
+            day_start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+            counts = ErrorLog.objects \
+                .filter(date__gte=day_start, date__lt=day_start + timedelta(days=1)) \
+                .values('error_message') \
+                .annotate(count=Count('id'))
+
+            ErrorLogDailyCount.objects.bulk_create(
+                [ErrorLogDailyCount(day=day, error_message=row['error_message'], count=row['count'])
+                 for row in counts],
+                ignore_conflicts=True)
+
+            day += timedelta(days=1)
+            days += 1
+
+        return days
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from landing.search import SEARCH_MODELS, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс (SearchDocument), например после массового импорта в обход сигналов'
+
+    def handle(self, *args, **options):
+        for model in SEARCH_MODELS:
+            with transaction.atomic():
+                count = rebuild_index(model)
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {count}')
+
+        self.stdout.write(self.style.SUCCESS('Индекс перестроен'))
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from landing.notifications import get_backends, claim_batch, deliver
+
+
+class Command(BaseCommand):
+    help = 'Доставляет уведомления из очереди (Notification) пачками, неудачные повторяет позже'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.NOTIFICATION_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Не завершаться, а проверять очередь постоянно')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Пауза между проверками пустой очереди в секундах')
+
+    def handle(self, *args, **options):
+        backends = get_backends()
+
+        while True:
+            close_old_connections()
+            processed = 0
+            for channel, backend in backends.items():
+                while True:
+                    notifications = claim_batch(channel, options['batch_size'])
+                    if not notifications:
+                        break
+
+                    sent = deliver(backend, notifications)
+                    processed += len(notifications)
+                    self.stdout.write(f'{channel}: отправлено {sent} из {len(notifications)}')
+
+                    if len(notifications) < options['batch_size']:
+                        break
+
+            if not options['loop']:
+                break
+            if not processed:
+                time.sleep(options['interval'])
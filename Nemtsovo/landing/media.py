@@ -0,0 +1,148 @@
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import Http404, FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.static import was_modified_since
+
+from landing.storage import is_content_addressed
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=86400'
+
+
+class RangeFileWrapper:
+    # отдаёт из файла только length байт начиная с offset, не читая файл целиком
+
+    def __init__(self, file, offset, length):
+        self.file = file
+        self.file.seek(offset)
+        self.remaining = length
+
+    def __iter__(self):
+        try:
+            while self.remaining > 0:
+                data = self.file.read(min(CHUNK_SIZE, self.remaining))
+                if not data:
+                    break
+                self.remaining -= len(data)
+                yield data
+        finally:
+            self.file.close()
+
+
+def get_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+# (start, end) включительно; None - заголовок не поддерживается и отдаём файл целиком;
+# ValueError - диапазон невыполним
+def parse_range(header, size):
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # несколько диапазонов не поддерживаем - по RFC 9110 можно ответить всем файлом
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        suffix_length = int(end)
+        # у пустого файла нет ни одного байта, который можно отдать
+        if suffix_length == 0 or size == 0:
+            raise ValueError
+        return max(0, size - suffix_length), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+def is_range_still_valid(request, etag, mtime):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and if_range_date == int(mtime)
+
+
+def get_sendfile_response(path, full_path):
+    header = settings.MEDIA_SENDFILE_HEADER
+    response = HttpResponse()
+    if header == 'X-Accel-Redirect':
+        response[header] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+    else:
+        response[header] = full_path
+    # тип файла определит фронтовой сервер
+    del response['Content-Type']
+    return response
+
+
+def serve_media(request, path):
+    path = posixpath.normpath(path).lstrip('/')
+    full_path = safe_join(settings.MEDIA_ROOT, path)
+    if not os.path.isfile(full_path):
+        raise Http404('Файл не найден')
+
+    if settings.MEDIA_SENDFILE_HEADER:
+        # Range, кеширование и саму передачу делает фронтовой сервер
+        return get_sendfile_response(path, full_path)
+
+    stat = os.stat(full_path)
+    etag = get_etag(stat)
+    cache_control = IMMUTABLE_CACHE_CONTROL if is_content_addressed(path) else DEFAULT_CACHE_CONTROL
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if (if_none_match and etag in if_none_match) or \
+            (not if_none_match and not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime)):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    size = stat.st_size
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and is_range_still_valid(request, etag, stat.st_mtime):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        # файл целиком - FileResponse отдаст его через wsgi.file_wrapper (sendfile без копирования)
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            RangeFileWrapper(open(full_path, 'rb'), start, end - start + 1),
+            status=206,
+            content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,47 @@
+from asyncio import iscoroutinefunction
+
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from landing.db_routers import RoutingState, _routing_state
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    # после записи клиент какое-то время читает из основной БД, чтобы не увидеть отстающую реплику
+    sticky_cookie = settings.REPLICA_STICKY_COOKIE
+    sticky_seconds = settings.REPLICA_STICKY_SECONDS
+
+    def start(request):
+        replica_allowed = request.method in SAFE_METHODS and sticky_cookie not in request.COOKIES
+        return _routing_state.set(RoutingState(replica_allowed))
+
+    def finish(token, response):
+        state = _routing_state.get()
+        _routing_state.reset(token)
+        if state.has_written:
+            response.set_cookie(sticky_cookie, '1', max_age=sticky_seconds, httponly=True, samesite='Lax')
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = start(request)
+            try:
+                response = await get_response(request)
+            except Exception:
+                _routing_state.reset(token)
+                raise
+            return finish(token, response)
+    else:
+        def middleware(request):
+            token = start(request)
+            try:
+                response = get_response(request)
+            except Exception:
+                _routing_state.reset(token)
+                raise
+            return finish(token, response)
+
+    return middleware
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ErrorLogDailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(editable=False, verbose_name='День')),
+                ('error_message', models.CharField(editable=False, max_length=500, verbose_name='Сообщение об ошибке')),
+                ('count', models.PositiveIntegerField(default=0, editable=False, verbose_name='Кол-во')),
+            ],
+            options={
+                'verbose_name': 'Статистика ошибок по дням',
+                'verbose_name_plural': 'Статистика ошибок по дням',
+                'ordering': ['-day', '-count'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='errorlog',
+            index=models.Index(fields=['is_solved', '-date'], name='errorlog_solved_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='errorlog',
+            index=models.Index(fields=['date'], name='errorlog_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='errorlogdailycount',
+            constraint=models.UniqueConstraint(fields=('day', 'error_message'), name='errorlog_daily_count_unique'),
+        ),
+    ]
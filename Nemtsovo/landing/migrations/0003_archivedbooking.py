@@ -0,0 +1,44 @@
+# Generated by Django 4.1.13 on 2026-10-19 00:40
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0002_errorlog_indexes_errorlogdailycount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fio', models.CharField(editable=False, max_length=100, verbose_name='ФИО')),
+                ('phone_number', models.CharField(editable=False, max_length=20, verbose_name='Номер телефона')),
+                ('adults_count', models.PositiveIntegerField(default=1, editable=False, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Кол-во взрослых')),
+                ('childs_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='Кол-во детей')),
+                ('desired_dates', models.CharField(editable=False, max_length=400, verbose_name='Желаемые даты')),
+                ('is_has_whatsapp', models.BooleanField(editable=False, verbose_name='Имеется Telegram')),
+                ('is_dayly', models.BooleanField(default=False, verbose_name='Суточное бронирование')),
+                ('is_late_checkout', models.BooleanField(blank=True, default=False, verbose_name='Поздний выезд')),
+                ('is_early_checkin', models.BooleanField(blank=True, default=False, verbose_name='Ранний заезд')),
+                ('status', models.CharField(choices=[('a', 'Активно 🟢'), ('b', 'Бронь ✔️'), ('c', 'Отменено ❌')], default='a', max_length=20, verbose_name='Статус')),
+                ('manager_comment', models.TextField(blank=True, help_text='Если надо что-то пометить для себя', null=True, verbose_name='Комментарий')),
+                ('user_comment', models.TextField(blank=True, editable=False, help_text='Из заявки на бронирование', null=True, verbose_name='Комментарий клиента')),
+                ('date_start_fact', models.DateTimeField(blank=True, null=True, verbose_name='Факт. начало')),
+                ('date_end_fact', models.DateTimeField(blank=True, null=True, verbose_name='Факт. конец')),
+                ('original_id', models.BigIntegerField(editable=False, unique=True, verbose_name='ID заявки')),
+                ('date_create', models.DateTimeField(editable=False, verbose_name='Дата создания')),
+                ('date_archived', models.DateTimeField(auto_now_add=True, verbose_name='Дата архивации')),
+                ('booking_identifier', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to='landing.bookingidentifier', verbose_name='Что забронировано')),
+            ],
+            options={
+                'verbose_name': 'Архивная заявка на бронирование',
+                'verbose_name_plural': 'Архив заявок на бронирование',
+                'ordering': ['-date_create'],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.13 on 2026-10-19 00:44
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0003_archivedbooking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(editable=False, help_text='Ключ из настройки NOTIFICATION_BACKENDS', max_length=50, verbose_name='Канал')),
+                ('subject', models.CharField(editable=False, max_length=200, verbose_name='Тема')),
+                ('body', models.TextField(editable=False, verbose_name='Текст')),
+                ('status', models.CharField(choices=[('p', 'Ожидает отправки'), ('s', 'Отправлено'), ('f', 'Не удалось отправить')], default='p', editable=False, max_length=1, verbose_name='Статус')),
+                ('attempts', models.PositiveIntegerField(default=0, editable=False, verbose_name='Попыток')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Следующая попытка')),
+                ('last_error', models.TextField(blank=True, editable=False, null=True, verbose_name='Последняя ошибка')),
+                ('date_create', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('date_sent', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Дата отправки')),
+            ],
+            options={
+                'verbose_name': 'Уведомление',
+                'verbose_name_plural': 'Уведомления',
+                'ordering': ['-date_create'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='notification_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.1.13 on 2026-10-19 01:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0004_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='date_update',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='Дата изменения'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.1.13 on 2026-10-19 00:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+FTS_TABLE = 'landing_searchdocument_fts'
+
+SQLITE_FTS = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(title, body, content='landing_searchdocument', "
+    f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER landing_searchdocument_ai AFTER INSERT ON landing_searchdocument BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    f"CREATE TRIGGER landing_searchdocument_ad AFTER DELETE ON landing_searchdocument BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END",
+    f"CREATE TRIGGER landing_searchdocument_au AFTER UPDATE ON landing_searchdocument BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+]
+
+SEARCH_MODELS = {
+    'news': ('title', 'description'),
+    'event': ('title', 'description'),
+    'house': ('name', 'description'),
+    'wellnesstreatment': ('name', 'description'),
+    'action': ('name', 'description'),
+    'ourproduct': ('name', 'description'),
+}
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for statement in SQLITE_FTS:
+            schema_editor.execute(statement)
+    elif vendor == 'mysql':
+        schema_editor.execute(
+            'ALTER TABLE landing_searchdocument ADD FULLTEXT INDEX searchdocument_fulltext_idx (title, body)')
+
+
+def drop_fulltext_index(apps, schema_editor):
+    # индекс MySQL удалится вместе с таблицей
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE {FTS_TABLE}')
+
+
+def fill_search_documents(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    SearchDocument = apps.get_model('landing', 'SearchDocument')
+    db_alias = schema_editor.connection.alias
+
+    for model_name, (title_field, body_field) in SEARCH_MODELS.items():
+        content_type, _ = ContentType.objects.using(db_alias).get_or_create(app_label='landing', model=model_name)
+        model = apps.get_model('landing', model_name)
+        SearchDocument.objects.using(db_alias).bulk_create(
+            (SearchDocument(content_type=content_type, object_id=pk, title=title, body=body or '')
+             for pk, title, body in model.objects.using(db_alias).values_list('pk', title_field, body_field)),
+            batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('landing', '0005_booking_date_update'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField(editable=False)),
+                ('title', models.CharField(editable=False, max_length=200, verbose_name='Заголовок')),
+                ('body', models.TextField(blank=True, editable=False, verbose_name='Текст')),
+                ('content_type', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ',
+                'verbose_name_plural': 'Поисковые документы',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('content_type', 'object_id'), name='searchdocument_object_unique'),
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.13 on 2026-10-19 00:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0006_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ourproduct',
+            index=models.Index(fields=['-is_available', 'price'], name='ourproduct_catalog_idx'),
+        ),
+    ]
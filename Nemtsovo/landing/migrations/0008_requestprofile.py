@@ -0,0 +1,35 @@
+# Generated by Django 4.1.13 on 2026-10-19 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0007_ourproduct_catalog_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата и время')),
+                ('method', models.CharField(editable=False, max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(editable=False, max_length=500, verbose_name='Адрес')),
+                ('route', models.CharField(editable=False, max_length=200, verbose_name='Маршрут')),
+                ('status_code', models.PositiveSmallIntegerField(editable=False, verbose_name='Код ответа')),
+                ('duration_ms', models.FloatField(editable=False, verbose_name='Время, мс')),
+                ('sql_count', models.PositiveIntegerField(editable=False, verbose_name='SQL-запросов')),
+                ('sql_duration_ms', models.FloatField(editable=False, verbose_name='Время SQL, мс')),
+                ('sql_summary', models.TextField(blank=True, editable=False, verbose_name='Самые затратные запросы')),
+                ('collapsed_stacks', models.TextField(blank=True, editable=False, verbose_name='Стеки (collapsed)')),
+                ('trigger', models.CharField(choices=[('sample', 'Случайная выборка'), ('staff', 'По запросу сотрудника')], editable=False, max_length=10, verbose_name='Причина')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ['-date'],
+            },
+        ),
+    ]
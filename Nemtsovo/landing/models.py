@@ -2,12 +2,15 @@ from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelatio
 from django.contrib.contenttypes.models import ContentType
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.urls import reverse
 from django.utils import timezone
 from django.contrib import admin
 from django.conf import settings
 import pytz
 from image_cropping import ImageRatioField
 
+from landing.image_processing import optimize_image, scale_cropping
+
 
 class BookingIdentifier(models.Model):
     name = models.CharField('Название', max_length=200, unique=True)
@@ -20,7 +23,7 @@ class BookingIdentifier(models.Model):
         return self.name
 
 
-class Booking(models.Model):
+class AbstractBooking(models.Model):
     booking_identifier = models.ForeignKey(
         BookingIdentifier,
         on_delete=models.CASCADE,
@@ -67,13 +70,39 @@ class Booking(models.Model):
         blank=True,
         null=True)
 
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return self.booking_identifier.name
+
+
+class Booking(AbstractBooking):
+    # по этой дате админка получает новые и изменённые заявки (landing.live)
+    date_update = models.DateTimeField('Дата изменения', auto_now=True, db_index=True, editable=False)
+
     class Meta:
         verbose_name = 'Заявка на бронирование'
         verbose_name_plural = 'Заявки на бронирование'
         ordering = ['status', '-date_create']
 
-    def __str__(self):
-        return self.booking_identifier.name
+
+class ArchivedBooking(AbstractBooking):
+    # завершённые и отменённые заявки переносятся сюда командой archive_bookings
+    original_id = models.BigIntegerField('ID заявки', unique=True, editable=False)
+    # без auto_now_add - дата переносится из заявки
+    date_create = models.DateTimeField('Дата создания', editable=False)
+    date_archived = models.DateTimeField('Дата архивации', auto_now_add=True, editable=False)
+
+    @classmethod
+    def from_booking(cls, booking):
+        values = {field.attname: getattr(booking, field.attname) for field in AbstractBooking._meta.fields}
+        return cls(original_id=booking.id, **values)
+
+    class Meta:
+        verbose_name = 'Архивная заявка на бронирование'
+        verbose_name_plural = 'Архив заявок на бронирование'
+        ordering = ['-date_create']
 
 
 class Period(models.Model):
@@ -138,6 +167,9 @@ class Attachment(models.Model):
     content_object = GenericForeignKey('content_type', 'object_id')
 
     def get_upload_path(self, filename):
+        # в content-addressed хранилище путь определяется содержимым, ContentType не нужен
+        if settings.MEDIA_CONTENT_ADDRESSED:
+            return filename
         return f'landing/{self.content_type.name}_{self.object_id}/{filename}'
 
     def get_miniature_upload_path(self, filename):
@@ -157,6 +189,16 @@ class Attachment(models.Model):
     def is_video(self):
         return self.file.name.endswith('.mp4')
 
+    def save(self, *args, **kwargs):
+        # новый файл оптимизируем до того, как он попадёт в хранилище
+        if settings.UPLOAD_IMAGE_OPTIMIZE and self.file and not self.file._committed:
+            optimized = optimize_image(self.file)
+            if optimized is not None:
+                self.file = optimized.content
+                self.miniature = scale_cropping(self.miniature, optimized.scale)
+
+        super().save(*args, **kwargs)
+
     class Meta:
         indexes = [
             models.Index(fields=["content_type", "object_id"]),
@@ -178,7 +220,14 @@ BTN_TEXT_CHOICES = [
     (APPOINTMENT_BTN_TEXT, 'Записаться')
 ]
 
-class House(models.Model):
+class WithGallery:
+    # для моделей с media: url, по которому страница подгружает всю галерею
+    def get_gallery_url(self):
+        content_type = ContentType.objects.get_for_model(self)
+        return reverse('gallery', args=[content_type.id, self.id])
+
+
+class House(WithGallery, models.Model):
     name = models.CharField(verbose_name='Название', max_length=32)
     start_price = models.PositiveIntegerField(verbose_name='Начальная цена', help_text="Поставьте 0 если это бесплатно")
     duration = models.PositiveIntegerField(
@@ -235,7 +284,7 @@ class House(models.Model):
         return self.name
 
 
-class WellnessTreatment(models.Model):
+class WellnessTreatment(WithGallery, models.Model):
     name = models.CharField(verbose_name='Название', max_length=32)
     start_price = models.PositiveIntegerField(verbose_name='Начальная цена', help_text="Оставьте 0 если это бесплатно")
     duration = models.PositiveIntegerField(
@@ -291,7 +340,7 @@ class WellnessTreatment(models.Model):
         return self.name
 
 
-class Action(models.Model):
+class Action(WithGallery, models.Model):
     name = models.CharField(verbose_name='Название', max_length=32)
     start_price = models.PositiveIntegerField(verbose_name='Начальная цена', help_text="Оставьте 0 если это бесплатно")
     duration = models.PositiveIntegerField(
@@ -376,6 +425,10 @@ class OurProduct(models.Model):
         verbose_name = 'Продукция'
         verbose_name_plural = verbose_name
         ordering = ['-is_available', 'price']
+        indexes = [
+            # под сортировку и фильтры каталога; id в InnoDB и rowid в SQLite входят в индекс неявно
+            models.Index(fields=['-is_available', 'price'], name='ourproduct_catalog_idx'),
+        ]
 
 
 class Event(models.Model):
@@ -420,7 +473,7 @@ class News(models.Model):
         ordering = ['-date']
 
 
-class OurPet(models.Model):
+class OurPet(WithGallery, models.Model):
     name = models.CharField('Имя питомаца', max_length=100)
     description = models.TextField('Описание', blank=True, null=True)
     media = GenericRelation(Attachment)
@@ -452,4 +505,109 @@ class ErrorLog(models.Model):
     class Meta:
         verbose_name = 'Ошибка'
         verbose_name_plural = 'Ошибки'
-        ordering = ['is_solved', '-date']
\ No newline at end of file
+        ordering = ['is_solved', '-date']
+        indexes = [
+            # под сортировку списка в админке
+            models.Index(fields=['is_solved', '-date'], name='errorlog_solved_date_idx'),
+            # под фильтр по дате и удаление старых записей
+            models.Index(fields=['date'], name='errorlog_date_idx'),
+        ]
+
+
+class ErrorLogDailyCount(models.Model):
+    day = models.DateField('День', editable=False)
+    error_message = models.CharField('Сообщение об ошибке', max_length=500, editable=False)
+    count = models.PositiveIntegerField('Кол-во', default=0, editable=False)
+
+    def __str__(self):
+        return f'{self.day} - {self.error_message}'
+
+    class Meta:
+        verbose_name = 'Статистика ошибок по дням'
+        verbose_name_plural = verbose_name
+        ordering = ['-day', '-count']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'error_message'], name='errorlog_daily_count_unique'),
+        ]
+
+class Notification(models.Model):
+    # outbox: пишется в одной транзакции с заявкой, доставляет команда send_notifications
+    PENDING = 'p'
+    SENT = 's'
+    FAILED = 'f'
+    STATUSES = [
+        (PENDING, 'Ожидает отправки'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Не удалось отправить'),
+    ]
+
+    channel = models.CharField('Канал', max_length=50, editable=False,
+                               help_text='Ключ из настройки NOTIFICATION_BACKENDS')
+    subject = models.CharField('Тема', max_length=200, editable=False)
+    body = models.TextField('Текст', editable=False)
+    status = models.CharField('Статус', choices=STATUSES, default=PENDING, max_length=1, editable=False)
+    attempts = models.PositiveIntegerField('Попыток', default=0, editable=False)
+    next_attempt_at = models.DateTimeField('Следующая попытка', default=timezone.now, editable=False)
+    last_error = models.TextField('Последняя ошибка', blank=True, null=True, editable=False)
+    date_create = models.DateTimeField('Дата создания', auto_now_add=True, editable=False)
+    date_sent = models.DateTimeField('Дата отправки', blank=True, null=True, editable=False)
+
+    def __str__(self):
+        return self.subject
+
+    class Meta:
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Уведомления'
+        ordering = ['-date_create']
+        indexes = [
+            # под выборку очереди воркером
+            models.Index(fields=['status', 'next_attempt_at'], name='notification_queue_idx'),
+        ]
+
+
+class SearchDocument(models.Model):
+    # поисковый индекс (landing.search): по строке на объект, синхронизируется сигналами.
+    # Полнотекстовый индекс над title и body создаётся миграцией: FTS5 в SQLite, FULLTEXT в MySQL.
+    # В SQLite FTS5 обновляется триггерами - если миграция пересоздаст таблицу, их надо создать заново
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, editable=False)
+    object_id = models.PositiveIntegerField(editable=False)
+    title = models.CharField('Заголовок', max_length=200, editable=False)
+    body = models.TextField('Текст', blank=True, editable=False)
+
+    def __str__(self):
+        return self.title
+
+    class Meta:
+        verbose_name = 'Поисковый документ'
+        verbose_name_plural = 'Поисковые документы'
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id'], name='searchdocument_object_unique'),
+        ]
+
+
+class RequestProfile(models.Model):
+    # профиль запроса от landing.profiling: стеки в формате collapsed stacks для flamegraph
+    TRIGGERS = [
+        ('sample', 'Случайная выборка'),
+        ('staff', 'По запросу сотрудника'),
+    ]
+
+    date = models.DateTimeField('Дата и время', auto_now_add=True, editable=False, db_index=True)
+    method = models.CharField('Метод', max_length=10, editable=False)
+    path = models.CharField('Адрес', max_length=500, editable=False)
+    route = models.CharField('Маршрут', max_length=200, editable=False)
+    status_code = models.PositiveSmallIntegerField('Код ответа', editable=False)
+    duration_ms = models.FloatField('Время, мс', editable=False)
+    sql_count = models.PositiveIntegerField('SQL-запросов', editable=False)
+    sql_duration_ms = models.FloatField('Время SQL, мс', editable=False)
+    sql_summary = models.TextField('Самые затратные запросы', blank=True, editable=False)
+    collapsed_stacks = models.TextField('Стеки (collapsed)', blank=True, editable=False)
+    trigger = models.CharField('Причина', choices=TRIGGERS, max_length=10, editable=False)
+
+    def __str__(self):
+        return f'{self.method} {self.path}'
+
+    class Meta:
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ['-date']
@@ -0,0 +1,149 @@
+import sys
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from landing.models import Notification
+
+
+class BaseBackend:
+    # канал доставки: получает пачку уведомлений, возвращает ошибки в том же порядке (None - доставлено)
+
+    def __init__(self, **options):
+        self.options = options
+
+    def send_batch(self, notifications):
+        errors = []
+        for notification in notifications:
+            try:
+                self.send(notification)
+                errors.append(None)
+            except Exception as e:
+                errors.append(str(e) or type(e).__name__)
+        return errors
+
+    def send(self, notification):
+        raise NotImplementedError
+
+    def is_configured(self):
+        # ненастроенному каналу уведомления не ставим: все попытки всё равно закончились бы ошибкой
+        return True
+
+
+class EmailBackend(BaseBackend):
+    # письма уходят через EMAIL_BACKEND джанги, пачка - через одно SMTP-соединение;
+    # локально можно поднять заглушку: python -m aiosmtpd -n -l localhost:1025 (pip install aiosmtpd)
+
+    def get_recipients(self):
+        return self.options.get('recipients') or settings.NOTIFICATION_EMAILS
+
+    def is_configured(self):
+        return bool(self.get_recipients())
+
+    def send_batch(self, notifications):
+        recipients = self.get_recipients()
+        if not recipients:
+            return ['Не заданы получатели'] * len(notifications)
+
+        try:
+            connection = get_connection(fail_silently=False)
+            connection.open()
+        except Exception as e:
+            return [str(e) or type(e).__name__] * len(notifications)
+
+        self.connection = connection
+        self.recipients = recipients
+        try:
+            return super().send_batch(notifications)
+        finally:
+            connection.close()
+
+    def send(self, notification):
+        EmailMessage(notification.subject, notification.body, to=self.recipients,
+                     connection=self.connection).send()
+
+
+class ConsoleBackend(BaseBackend):
+    # для отладки - печатает уведомления в stdout воркера
+
+    def send(self, notification):
+        sys.stdout.write(f'{notification.subject}\n{notification.body}\n\n')
+        sys.stdout.flush()
+
+
+def get_backends():
+    return {
+        channel: import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+        for channel, config in settings.NOTIFICATION_BACKENDS.items()
+    }
+
+
+def enqueue_booking_notification(booking):
+    # вызывать внутри транзакции, в которой сохраняется заявка
+    subject = f'Новая заявка на бронирование №{booking.pk}'
+    body = '\n'.join([
+        f'Что: {booking.booking_identifier.name}',
+        f'Даты: {booking.desired_dates}',
+        f'ФИО: {booking.fio}',
+        f'Телефон: {booking.phone_number}' + (' (Telegram)' if booking.is_has_whatsapp else ''),
+        f'Взрослых: {booking.adults_count}, детей: {booking.childs_count}',
+        f'Поздний выезд: {"да" if booking.is_late_checkout else "нет"}, '
+        f'ранний заезд: {"да" if booking.is_early_checkin else "нет"}',
+        f'Комментарий: {booking.user_comment or "-"}',
+    ])
+
+    Notification.objects.bulk_create([
+        Notification(channel=channel, subject=subject, body=body)
+        for channel, backend in get_backends().items()
+        if backend.is_configured()
+    ])
+
+
+def get_retry_delay(attempts):
+    # экспоненциальная пауза: 30с, 1м, 2м, 4м ... но не больше часа
+    return timedelta(seconds=min(settings.NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (attempts - 1), 60 * 60))
+
+
+def claim_batch(channel, batch_size):
+    # забираем пачку и откладываем её на NOTIFICATION_LEASE_SECONDS: параллельный воркер её не возьмёт,
+    # а если этот упадёт - пачка вернётся в очередь сама
+    now = timezone.now()
+    with transaction.atomic():
+        notifications = list(
+            Notification.objects
+            .select_for_update(skip_locked=True)
+            .filter(channel=channel, status=Notification.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size])
+        Notification.objects \
+            .filter(pk__in=[notification.pk for notification in notifications]) \
+            .update(next_attempt_at=now + timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS))
+    return notifications
+
+
+def deliver(backend, notifications):
+    now = timezone.now()
+    try:
+        errors = backend.send_batch(notifications)
+    except Exception as e:
+        errors = [str(e) or type(e).__name__] * len(notifications)
+
+    for notification, error in zip(notifications, errors):
+        notification.attempts += 1
+        if error is None:
+            notification.status = Notification.SENT
+            notification.date_sent = now
+            notification.last_error = None
+        else:
+            notification.last_error = error
+            if notification.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                notification.status = Notification.FAILED
+            else:
+                notification.next_attempt_at = now + get_retry_delay(notification.attempts)
+
+    Notification.objects.bulk_update(
+        notifications, ['status', 'attempts', 'next_attempt_at', 'last_error', 'date_sent'])
+    return errors.count(None)
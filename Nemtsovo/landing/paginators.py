@@ -0,0 +1,136 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+ESTIMATED_COUNT_CACHE_KEY = 'estimated_count:{}:{}'
+
+
+def get_table_statistics_count(connection, table):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [table])
+        elif connection.vendor == 'sqlite':
+            # есть только после ANALYZE, первое число в stat - кол-во строк
+            cursor.execute("SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+        else:
+            return None
+
+        row = cursor.fetchone()
+        return int(row[0]) if row and row[0] is not None else None
+
+
+def get_estimated_count(queryset):
+    db = queryset.db
+    table = queryset.model._meta.db_table
+
+    estimate = get_table_statistics_count(connections[db], table)
+    if estimate is not None:
+        return estimate
+
+    # статистики нет - считаем точно, но не чаще раза в ESTIMATED_COUNT_CACHE_TIMEOUT
+    cache_key = ESTIMATED_COUNT_CACHE_KEY.format(db, table)
+    estimate = cache.get(cache_key)
+    if estimate is None:
+        estimate = queryset.count()
+        cache.set(cache_key, estimate, settings.ADMIN_ESTIMATED_COUNT_CACHE_TIMEOUT)
+    return estimate
+
+
+class EstimatedCountPaginator(Paginator):
+    # Для больших таблиц без фильтров вместо COUNT(*) берёт статистику таблицы или закешированный count.
+    # С фильтрами/поиском и для маленьких таблиц считает точно
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query') or queryset.query.where:
+            return super().count
+
+        estimate = get_estimated_count(queryset)
+        if estimate < settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+            return super().count
+        return estimate
+
+
+class EstimatedCountAdminMixin:
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(obj, ordering):
+    return '.'.join(str(int(getattr(obj, field.lstrip('-')))) for field in ordering)
+
+
+def decode_cursor(cursor, ordering):
+    # курсор - целые значения полей сортировки через точку; испорченный курсор = первая страница
+    try:
+        values = [int(value) for value in cursor.split('.')]
+    except (AttributeError, ValueError):
+        return None
+    return values if len(values) == len(ordering) else None
+
+
+def get_keyset_filter(ordering, values):
+    # строки строго после values при сортировке ordering:
+    # a >= x AND ((a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z) ...)
+    # a >= x дублирует условие, но только по нему база может начать с нужного места индекса
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = f'{name}__lt' if field.startswith('-') else f'{name}__gt'
+        condition |= equal & Q(**{lookup: value})
+        equal &= Q(**{name: value})
+
+    first_name = ordering[0].lstrip('-')
+    bound = f'{first_name}__lte' if ordering[0].startswith('-') else f'{first_name}__gte'
+    return Q(**{bound: values[0]}) & condition
+
+
+# Пагинация по ключу вместо OFFSET: стоимость страницы не зависит от того, насколько она далеко.
+# Последнее поле ordering должно быть уникальным (обычно id).
+# Развёрнутое условие с OR по первому полю SQLite не может превратить в поиск по индексу и идёт по нему
+# с начала. Поэтому страница ищется в пределах текущего значения первого поля (is_available), а если
+# её не хватило - продолжается с начала следующих значений; оба запроса - диапазоны индекса
+def get_keyset_page(queryset, ordering, cursor, per_page):
+    queryset = queryset.order_by(*ordering)
+    values = decode_cursor(cursor, ordering) if cursor else None
+    if not values:
+        object_list = list(queryset[:per_page + 1])
+    else:
+        first_field = ordering[0]
+        # __in, а не равенство: is_available=True джанга пишет в SQLite как голое "is_available",
+        # и индекс для него не используется
+        same_partition = queryset.filter(Q(**{first_field.lstrip('-') + '__in': [values[0]]}))
+        if len(ordering) > 1:
+            same_partition = same_partition.filter(get_keyset_filter(ordering[1:], values[1:]))
+        object_list = list(same_partition[:per_page + 1])
+        if len(object_list) <= per_page:
+            next_partitions = queryset.filter(get_keyset_filter(ordering[:1], values[:1]))
+            object_list += list(next_partitions[:per_page + 1 - len(object_list)])
+
+    if len(object_list) <= per_page:
+        return KeysetPage(object_list, None)
+
+    object_list = object_list[:per_page]
+    return KeysetPage(object_list, encode_cursor(object_list[-1], ordering))
@@ -0,0 +1,147 @@
+import random
+import sys
+import threading
+import time
+import traceback
+from asyncio import iscoroutinefunction
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.decorators import sync_and_async_middleware
+
+SQL_SUMMARY_SIZE = 10
+SQL_TEXT_LENGTH = 300
+
+
+class StackSampler:
+    # Раз в PROFILING_INTERVAL снимает стек потока запроса и считает одинаковые стеки.
+    # Результат - collapsed stacks ("корень;...;функция кол-во"), формат flamegraph.pl и speedscope
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}")
+                frame = frame.f_back
+            if frames:
+                self.stacks[';'.join(reversed(frames))] += 1
+            # ссылки на кадры не держим, чтобы не продлевать жизнь их локальным переменным
+            del frame
+
+    def get_collapsed(self):
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common())
+
+
+class QueryRecorder:
+    # считает запросы через execute_wrapper, поэтому работает и без DEBUG
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started_at))
+
+    @property
+    def total_time(self):
+        return sum(duration for sql, duration in self.queries)
+
+    def get_summary(self):
+        # одинаковые запросы (N+1) группируем, сверху - самые затратные
+        grouped = {}
+        for sql, duration in self.queries:
+            count, total = grouped.get(sql, (0, 0))
+            grouped[sql] = (count + 1, total + duration)
+
+        top = sorted(grouped.items(), key=lambda item: item[1][1], reverse=True)[:SQL_SUMMARY_SIZE]
+        return '\n'.join(f'{total * 1000:.1f} ms x{count}: {sql[:SQL_TEXT_LENGTH]}' for sql, (count, total) in top)
+
+
+def get_trigger(request):
+    if request.META.get(settings.PROFILING_HEADER) or settings.PROFILING_COOKIE in request.COOKIES:
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return 'staff'
+    if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+        return 'sample'
+    return None
+
+
+def save_profile(request, response, trigger, duration, sampler, recorder):
+    from landing.models import RequestProfile
+    from landing.views import add_log_to_db
+
+    resolver_match = request.resolver_match
+    try:
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            path=request.get_full_path()[:500],
+            route=(resolver_match.route or resolver_match.view_name)[:200] if resolver_match else '',
+            status_code=response.status_code,
+            duration_ms=duration * 1000,
+            sql_count=len(recorder.queries),
+            sql_duration_ms=recorder.total_time * 1000,
+            sql_summary=recorder.get_summary(),
+            collapsed_stacks=sampler.get_collapsed(),
+            trigger=trigger,
+        )
+        # храним только последние PROFILING_KEEP профилей
+        RequestProfile.objects.filter(pk__lte=profile.pk - settings.PROFILING_KEEP).delete()
+    except Exception as e:
+        add_log_to_db("Failed to save request profile: " + str(e), traceback.extract_stack(), request.path)
+
+
+@sync_and_async_middleware
+def profiling_middleware(get_response):
+    # Профилирует долю запросов PROFILING_SAMPLE_RATE и запросы сотрудников с заголовком X-Profile
+    # или cookie profile. Асинхронные запросы пропускаются: стек потока в event loop ничего не покажет.
+    # Потоковые ответы профилируются только до начала отдачи тела
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return await get_response(request)
+
+        return middleware
+
+    def middleware(request):
+        trigger = get_trigger(request)
+        if trigger is None:
+            return get_response(request)
+
+        sampler = StackSampler(threading.get_ident(), settings.PROFILING_INTERVAL)
+        recorder = QueryRecorder()
+        started_at = time.perf_counter()
+        sampler.start()
+        try:
+            with ExitStack() as stack:
+                for alias in settings.DATABASES:
+                    stack.enter_context(connections[alias].execute_wrapper(recorder))
+                response = get_response(request)
+        finally:
+            sampler.stop()
+        duration = time.perf_counter() - started_at
+
+        save_profile(request, response, trigger, duration, sampler, recorder)
+        return response
+
+    return middleware
@@ -0,0 +1,123 @@
+import functools
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+
+BUCKET_KEY = 'ratelimit:{}:{}'
+WINDOW_KEY = 'ratelimit:window:{}:{}'
+COUNTER_KEY = 'ratelimit:counter:{}:{}'
+COUNTER_TIMEOUT = 60 * 60 * 24 * 30
+
+# LocMemCache у каждого процесса свой, так что get/set бакета достаточно развести между потоками
+_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.RATE_LIMIT_CACHE_ALIAS]
+
+
+def get_client_ip(request):
+    if settings.RATE_LIMIT_TRUST_X_FORWARDED_FOR:
+        forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        if forwarded_for:
+            # первые адреса присылает сам клиент, доверять можно только последнему - его дописал nginx
+            return forwarded_for.split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def spend_token(bucket, capacity, refill_rate, now):
+    # бакет - (токены, время последнего пополнения); возвращает (новый бакет, через сколько секунд будет токен)
+    tokens, updated_at = bucket or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / refill_rate
+
+
+def take_fixed_window_token(cache, key, capacity, refill_rate, now):
+    # для кешей без атомарного update (memcached, redis): capacity запросов за окно,
+    # за которое бакет наполнился бы целиком; add/incr атомарны в любом бэкенде
+    window = capacity / refill_rate
+    window_start = now - now % window
+    key = WINDOW_KEY.format(key, int(window_start))
+    cache.add(key, 0, math.ceil(window))
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        count = 1
+    if count <= capacity:
+        return 0
+    return window_start + window - now
+
+
+def take_token(key, capacity, refill_rate, now):
+    # чтение и запись бакета должны быть атомарны для всех воркеров, которые делят кеш
+    cache = get_cache()
+    timeout = math.ceil(capacity / refill_rate)
+    if hasattr(cache, 'update'):
+        return cache.update(key, lambda bucket: spend_token(bucket, capacity, refill_rate, now), timeout)
+
+    if isinstance(cache, LocMemCache):
+        with _lock:
+            bucket, retry_after = spend_token(cache.get(key), capacity, refill_rate, now)
+            cache.set(key, bucket, timeout)
+        return retry_after
+
+    return take_fixed_window_token(cache, key, capacity, refill_rate, now)
+
+
+def increment_counter(endpoint, name):
+    cache = get_cache()
+    key = COUNTER_KEY.format(endpoint, name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, COUNTER_TIMEOUT)
+
+
+def get_counters():
+    cache = get_cache()
+    return {
+        endpoint: {
+            name: cache.get(COUNTER_KEY.format(endpoint, name), 0)
+            for name in ('allowed', 'shed')
+        }
+        for endpoint in settings.RATE_LIMITS
+    }
+
+
+def check_rate_limit(request, endpoint):
+    limits = settings.RATE_LIMITS[endpoint]
+    now = time.time()
+
+    retry_after = take_token(BUCKET_KEY.format(endpoint, get_client_ip(request)), *limits['per_ip'], now)
+    if not retry_after and 'total' in limits:
+        retry_after = take_token(BUCKET_KEY.format(endpoint, '*'), *limits['total'], now)
+
+    increment_counter(endpoint, 'shed' if retry_after else 'allowed')
+    return retry_after
+
+
+def rate_limited(endpoint):
+    # отказываем с 429 раньше, чем view сходит в БД
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if endpoint not in settings.RATE_LIMITS:
+                return view(request, *args, **kwargs)
+            retry_after = check_rate_limit(request, endpoint)
+            if retry_after:
+                response = HttpResponse('Too many requests', status=429)
+                response['Retry-After'] = str(math.ceil(retry_after))
+                return response
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,136 @@
+import re
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, router
+from django.urls import reverse
+
+from landing.models import News, Event, House, WellnessTreatment, Action, OurProduct, SearchDocument
+
+FTS_TABLE = 'landing_searchdocument_fts'
+FULLTEXT_INDEX = 'searchdocument_fulltext_idx'
+
+# модель -> (поле заголовка, поле текста, страница с объектом)
+SEARCH_MODELS = {
+    News: ('title', 'description', 'news'),
+    Event: ('title', 'description', 'events'),
+    House: ('name', 'description', 'index'),
+    WellnessTreatment: ('name', 'description', 'index'),
+    Action: ('name', 'description', 'index'),
+    OurProduct: ('name', 'description', 'our_products'),
+}
+
+TITLE_WEIGHT = 10.0
+SNIPPET_LENGTH = 200
+WORD_RE = re.compile(r'\w+')
+
+
+class SearchUnavailable(Exception):
+    # полнотекстовый индекс есть только для SQLite и MySQL
+    pass
+
+
+def update_document(instance):
+    title_field, body_field, _ = SEARCH_MODELS[type(instance)]
+    SearchDocument.objects.update_or_create(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+        defaults={
+            'title': getattr(instance, title_field),
+            'body': getattr(instance, body_field) or '',
+        })
+
+
+def delete_document(instance):
+    SearchDocument.objects \
+        .filter(content_type=ContentType.objects.get_for_model(instance), object_id=instance.pk) \
+        .delete()
+
+
+def rebuild_index(model):
+    title_field, body_field, _ = SEARCH_MODELS[model]
+    content_type = ContentType.objects.get_for_model(model)
+
+    SearchDocument.objects.filter(content_type=content_type).delete()
+    SearchDocument.objects.bulk_create(
+        (SearchDocument(content_type=content_type, object_id=pk, title=title, body=body or '')
+         for pk, title, body in model.objects.values_list('pk', title_field, body_field).iterator()),
+        batch_size=500)
+    return model.objects.count()
+
+
+def get_words(query):
+    return WORD_RE.findall(query.lower())[:10]
+
+
+def search_sqlite(cursor, words, content_type_ids, limit):
+    # каждое слово - префикс, все слова обязательны; bm25 тем меньше, чем релевантнее
+    match = ' '.join('"%s"*' % word for word in words)
+    cursor.execute(
+        f'SELECT d.id, bm25({FTS_TABLE}, %s, 1.0) AS rank '
+        f'FROM {FTS_TABLE} JOIN landing_searchdocument d ON d.id = {FTS_TABLE}.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s AND d.content_type_id IN ({", ".join(["%s"] * len(content_type_ids))}) '
+        f'ORDER BY rank LIMIT %s',
+        [TITLE_WEIGHT, match, *content_type_ids, limit])
+    return [row[0] for row in cursor.fetchall()]
+
+
+def search_mysql(cursor, words, content_type_ids, limit):
+    against = ' '.join('+%s*' % word for word in words)
+    cursor.execute(
+        'SELECT id FROM landing_searchdocument '
+        'WHERE MATCH(title, body) AGAINST (%s IN BOOLEAN MODE) '
+        f'AND content_type_id IN ({", ".join(["%s"] * len(content_type_ids))}) '
+        'ORDER BY MATCH(title, body) AGAINST (%s IN BOOLEAN MODE) DESC LIMIT %s',
+        [against, *content_type_ids, against, limit])
+    return [row[0] for row in cursor.fetchall()]
+
+
+# найденные SearchDocument по убыванию релевантности
+def search(query, models=None, limit=20):
+    words = get_words(query)
+    if not words:
+        return []
+
+    content_type_ids = [content_type.id for content_type in
+                        ContentType.objects.get_for_models(*(models or SEARCH_MODELS)).values()]
+    connection = connections[router.db_for_read(SearchDocument)]
+
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            ids = search_sqlite(cursor, words, content_type_ids, limit)
+    elif connection.vendor == 'mysql':
+        with connection.cursor() as cursor:
+            ids = search_mysql(cursor, words, content_type_ids, limit)
+    else:
+        raise SearchUnavailable(f'Full-text search is not supported for {connection.vendor}')
+
+    documents = SearchDocument.objects.select_related('content_type').in_bulk(ids)
+    return [documents[pk] for pk in ids if pk in documents]
+
+
+def get_result(document):
+    model = document.content_type.model_class()
+    body = document.body
+    return {
+        'type': model._meta.verbose_name,
+        'title': document.title,
+        'snippet': body if len(body) <= SNIPPET_LENGTH else body[:SNIPPET_LENGTH].rsplit(' ', 1)[0] + '…',
+        'url': reverse(SEARCH_MODELS[model][2]),
+    }
+
+
+class FullTextSearchAdminMixin:
+    # поиск в админке по полнотекстовому индексу вместо LIKE '%...%' по описаниям
+    full_text_search_limit = 1000
+
+    def get_search_results(self, request, queryset, search_term):
+        # цены и другие числа ищем как раньше, по search_fields
+        if not get_words(search_term) or search_term.strip().isdigit():
+            return super().get_search_results(request, queryset, search_term)
+
+        try:
+            documents = search(search_term, models=[self.model], limit=self.full_text_search_limit)
+        except SearchUnavailable:
+            return super().get_search_results(request, queryset, search_term)
+
+        return queryset.filter(pk__in=[document.object_id for document in documents]), False
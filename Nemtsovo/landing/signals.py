@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+
+from landing import search, static_export
+from landing.sqlite_tuning import apply_sqlite_pragmas
+from landing.views import GALLERY_CACHE_KEY
+from landing.models import Attachment
+
+
+def rerender_static_pages(sender, instance, raw=False, **kwargs):
+    if raw or not static_export.get_export_root():
+        return
+
+    pages = static_export.get_affected_pages(instance)
+    if pages:
+        transaction.on_commit(lambda: static_export.schedule_export(pages))
+
+
+for model in (*static_export.MODEL_PAGES, Attachment):
+    post_save.connect(rerender_static_pages, sender=model, dispatch_uid=f'static_export_save_{model.__name__}')
+    post_delete.connect(rerender_static_pages, sender=model, dispatch_uid=f'static_export_delete_{model.__name__}')
+
+
+def invalidate_gallery(sender, instance, raw=False, **kwargs):
+    cache_key = GALLERY_CACHE_KEY.format(instance.content_type_id, instance.object_id)
+    transaction.on_commit(lambda: cache.delete(cache_key))
+
+
+post_save.connect(invalidate_gallery, sender=Attachment, dispatch_uid='invalidate_gallery_save')
+post_delete.connect(invalidate_gallery, sender=Attachment, dispatch_uid='invalidate_gallery_delete')
+
+def update_search_document(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.update_document(instance)
+
+
+def delete_search_document(sender, instance, **kwargs):
+    search.delete_document(instance)
+
+
+for model in search.SEARCH_MODELS:
+    post_save.connect(update_search_document, sender=model, dispatch_uid=f'search_save_{model.__name__}')
+    post_delete.connect(delete_search_document, sender=model, dispatch_uid=f'search_delete_{model.__name__}')
+
+connection_created.connect(apply_sqlite_pragmas, dispatch_uid='apply_sqlite_pragmas')
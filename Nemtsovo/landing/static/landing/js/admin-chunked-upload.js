@@ -0,0 +1,154 @@
+// Большие Фото/Видео в инлайне загружаются частями сразу после выбора файла.
+// При обрыве связи загрузка продолжается с того места, до которого дошёл сервер,
+// а после перезагрузки страницы - если выбрать тот же файл ещё раз
+(function () {
+    const MAX_RETRY_DELAY = 30000;
+    let activeUploads = 0;
+
+    function getCsrfToken() {
+        const input = document.querySelector('input[name=csrfmiddlewaretoken]');
+        return input ? input.value : '';
+    }
+
+    async function sha256(buffer) {
+        const digest = await crypto.subtle.digest('SHA-256', buffer);
+        return Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+    }
+
+    function sleep(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+
+    async function request(url, options) {
+        const response = await fetch(url, {
+            credentials: 'same-origin',
+            ...options,
+            headers: {'X-CSRFToken': getCsrfToken(), ...(options && options.headers)},
+        });
+        const data = await response.json().catch(() => ({}));
+        return {status: response.status, data: data};
+    }
+
+    // id начатой загрузки живёт в localStorage, чтобы продолжить её и после перезагрузки страницы
+    function getStorageKey(file) {
+        return `chunked-upload:${file.name}:${file.size}:${file.lastModified}`;
+    }
+
+    async function getOrStartUpload(url, file) {
+        const uploadId = localStorage.getItem(getStorageKey(file));
+        if (uploadId) {
+            const {status, data} = await request(`${url}/${uploadId}`);
+            if (status === 200) {
+                return data;
+            }
+            localStorage.removeItem(getStorageKey(file));
+        }
+
+        const {status, data} = await request(url, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({name: file.name, size: file.size}),
+        });
+        if (status !== 201) {
+            throw new Error(data.error || `Ошибка ${status}`);
+        }
+        localStorage.setItem(getStorageKey(file), data.id);
+        return data;
+    }
+
+    async function upload(url, chunkSize, file, onProgress) {
+        let retryDelay = 1000;
+        let uploadId = null;
+        let offset = 0;
+
+        while (uploadId === null || offset < file.size) {
+            try {
+                if (uploadId === null) {
+                    const data = await getOrStartUpload(url, file);
+                    uploadId = data.id;
+                    offset = data.offset;
+                    onProgress(offset);
+                    continue;
+                }
+
+                const chunk = await file.slice(offset, offset + chunkSize).arrayBuffer();
+                const {status, data} = await request(`${url}/${uploadId}?offset=${offset}`, {
+                    method: 'PUT',
+                    headers: {'Content-Type': 'application/octet-stream', 'X-Chunk-Sha256': await sha256(chunk)},
+                    body: chunk,
+                });
+
+                if (status === 200 || status === 409 || (status === 400 && data.offset != null)) {
+                    // принят, не по порядку или повреждён - в любом случае продолжаем с позиции сервера
+                    offset = data.offset;
+                    retryDelay = 1000;
+                    onProgress(offset);
+                } else if (status >= 400 && status < 500) {
+                    localStorage.removeItem(getStorageKey(file));
+                    throw new Error(data.error || `Ошибка ${status}`);
+                } else {
+                    throw new TypeError(`Ошибка сервера ${status}`);
+                }
+            } catch (error) {
+                // TypeError - нет связи или сервер недоступен: ждём и спрашиваем сервер, сколько он уже получил
+                if (!(error instanceof TypeError)) {
+                    throw error;
+                }
+                onProgress(offset, 'нет связи, повтор...');
+                if (!navigator.onLine) {
+                    await new Promise(resolve => window.addEventListener('online', resolve, {once: true}));
+                }
+                await sleep(retryDelay);
+                retryDelay = Math.min(retryDelay * 2, MAX_RETRY_DELAY);
+                uploadId = null;
+            }
+        }
+
+        localStorage.removeItem(getStorageKey(file));
+        return uploadId;
+    }
+
+    document.addEventListener('change', async function (event) {
+        const input = event.target;
+        if (!input.matches('input[type=file][name$="-file"]') || !input.files.length || !window.crypto?.subtle) {
+            return;
+        }
+
+        const hidden = document.querySelector(`input[name="${input.name.replace(/-file$/, '-chunked_upload')}"]`);
+        const file = input.files[0];
+        if (!hidden || file.size <= Number(hidden.dataset.chunkSize)) {
+            return;
+        }
+
+        let status = input.parentNode.querySelector('.chunked-upload-status');
+        if (!status) {
+            status = document.createElement('div');
+            status.className = 'chunked-upload-status help';
+            input.after(status);
+        }
+        const onProgress = (offset, note) => {
+            const percent = Math.floor(offset / file.size * 100);
+            status.textContent = `${file.name}: ${percent}%` + (note ? `, ${note}` : '');
+        };
+
+        // файл уходит частями, с формой его отправлять не нужно
+        input.value = '';
+        hidden.value = '';
+        activeUploads += 1;
+        try {
+            hidden.value = await upload(hidden.dataset.uploadUrl, Number(hidden.dataset.chunkSize), file, onProgress);
+            status.textContent = `${file.name}: загружен, сохраните форму`;
+        } catch (error) {
+            status.textContent = `${file.name}: ${error.message}`;
+        } finally {
+            activeUploads -= 1;
+        }
+    });
+
+    document.addEventListener('submit', function (event) {
+        if (activeUploads) {
+            event.preventDefault();
+            alert('Дождитесь окончания загрузки файлов');
+        }
+    }, true);
+})();
@@ -0,0 +1,50 @@
+// Список заявок в админке получает новые и изменённые заявки по SSE, без перезагрузки страницы
+document.addEventListener('DOMContentLoaded', function () {
+    const panel = document.getElementById('live-bookings');
+    if (!panel || !window.EventSource) {
+        return;
+    }
+
+    const list = panel.querySelector('ul');
+    const title = document.title;
+    const items = {};
+    let newCount = 0;
+
+    const source = new EventSource(panel.dataset.url);
+    source.addEventListener('booking', function (event) {
+        const booking = JSON.parse(event.data);
+
+        let item = items[booking.id];
+        if (!item) {
+            item = document.createElement('li');
+            item.className = 'info';
+            items[booking.id] = item;
+            list.prepend(item);
+        }
+
+        const link = document.createElement('a');
+        link.href = booking.url;
+        link.textContent = booking.name;
+        item.replaceChildren(
+            link,
+            ` - ${booking.fio}, ${booking.phone_number}, ${booking.desired_dates}: ${booking.status_display}`);
+        item.className = booking.status === 'a' ? 'warning' : 'info';
+        panel.hidden = false;
+
+        // строка уже есть в таблице - подсвечиваем её
+        const checkbox = document.querySelector(`#result_list input.action-select[value="${booking.id}"]`);
+        if (checkbox) {
+            checkbox.closest('tr').classList.add('selected');
+        } else if (booking.status === 'a') {
+            newCount += 1;
+            document.title = `(${newCount}) ${title}`;
+        }
+    });
+
+    // без ASGI эндпоинта нет - больше не переподключаемся
+    source.addEventListener('error', function () {
+        if (source.readyState === EventSource.CLOSED) {
+            source.close();
+        }
+    });
+});
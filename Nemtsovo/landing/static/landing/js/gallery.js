@@ -0,0 +1,27 @@
+// В карточках на главной отрендерена только обложка, всю галерею подгружаем при открытии
+const loadedGalleries = {};
+
+async function loadGallery(url) {
+    if (!loadedGalleries[url]) {
+        const response = await fetch(url, {headers: {'Accept': 'application/json'}});
+        const data = await response.json();
+        loadedGalleries[url] = data['items'];
+    }
+
+    return loadedGalleries[url];
+}
+
+document.querySelectorAll('[data-gallery-url]').forEach(link => {
+    link.addEventListener('click', async evt => {
+        evt.preventDefault();
+
+        try {
+            const items = await loadGallery(link.dataset.galleryUrl);
+            Fancybox.show(items);
+        } catch (e) {
+            console.error(e.message);
+            // хотя бы обложку покажем
+            Fancybox.show([{src: link.getAttribute('href')}]);
+        }
+    });
+});
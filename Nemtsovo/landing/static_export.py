@@ -0,0 +1,187 @@
+import gzip
+import os
+import threading
+import traceback
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.paginator import Paginator
+from django.db import connections
+from django.test import RequestFactory
+from django.utils import timezone
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import landing.views
+from landing.models import House, AdditionalInfo, AdditionalInfoItem, WellnessTreatment, Action, OurProduct, Event, \
+    News, OurPet, Period, Attachment, BookingIdentifier
+
+# Страницы, которые можно отдать с диска: имя -> (путь, view, файл)
+# Фронтовой сервер ищет файл как $uri.html, для новостей - news-page-$arg_page.html
+# Каталог с фильтрами или курсором (?after=) на диске нет - такие запросы сервер должен отдавать в Django
+PAGES = {
+    'index': ('/', landing.views.index, 'index.html'),
+    'events': ('/events', landing.views.events, 'events.html'),
+    'news': ('/news', landing.views.news, 'news.html'),
+    'products': ('/products', landing.views.our_products, 'products.html'),
+}
+
+# какие страницы надо перерисовать при изменении модели
+MODEL_PAGES = {
+    House: ('index',),
+    AdditionalInfo: ('index',),
+    AdditionalInfoItem: ('index',),
+    WellnessTreatment: ('index',),
+    Action: ('index',),
+    OurPet: ('index',),
+    Period: ('index',),
+    BookingIdentifier: ('index',),
+    OurProduct: ('index', 'products'),
+    Event: ('index', 'events'),
+    News: ('index', 'news'),
+}
+
+NEWS_PAGE_FILE = 'news-page-{}.html'
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+
+_pending_pages = set()
+_pending_lock = threading.Lock()
+_worker = None
+
+
+def get_export_root():
+    return getattr(settings, 'STATIC_EXPORT_ROOT', None)
+
+
+def get_affected_pages(instance):
+    if isinstance(instance, Attachment):
+        model = instance.content_type.model_class()
+    else:
+        model = type(instance)
+
+    return MODEL_PAGES.get(model, ())
+
+
+def get_pages_with_passed_events(root=None):
+    # Ближайшие события вшиваются в страницу при рендере, и прошедшее событие осталось бы на ней
+    # до следующей правки в админке. Возвращает страницы, если с их рендера какое-то событие прошло
+    root = root or get_export_root()
+    pages = MODEL_PAGES[Event]
+    try:
+        rendered_at = min(os.path.getmtime(os.path.join(root, PAGES[name][2])) for name in pages)
+    except OSError:
+        return pages
+
+    rendered_at = datetime.fromtimestamp(rendered_at, tz=dt_timezone.utc)
+    if Event.objects.filter(date__gt=rendered_at, date__lte=timezone.now()).exists():
+        return pages
+    return ()
+
+
+def export_pages(pages=None, root=None):
+    root = root or get_export_root()
+    os.makedirs(root, exist_ok=True)
+
+    written = []
+    for name in pages or PAGES:
+        path, view, filename = PAGES[name]
+
+        if name == 'news':
+            written += export_news_pages(root)
+            continue
+
+        write_page(root, filename, render_page(path, view))
+        written.append(filename)
+
+    return written
+
+
+def export_news_pages(root):
+    path, view, filename = PAGES['news']
+    paginator = Paginator(News.objects.all(), landing.views.NEWS_PER_PAGE)
+
+    written = []
+    for page_number in paginator.page_range:
+        content = render_page(path, view, {'page': page_number})
+        page_filename = filename if page_number == 1 else NEWS_PAGE_FILE.format(page_number)
+        write_page(root, page_filename, content)
+        written.append(page_filename)
+
+    # страниц могло стать меньше - убираем лишние, чтобы не отдавать удалённые новости
+    stale_number = paginator.num_pages + 1
+    while os.path.exists(os.path.join(root, NEWS_PAGE_FILE.format(stale_number))):
+        remove_page(root, NEWS_PAGE_FILE.format(stale_number))
+        stale_number += 1
+
+    return written
+
+
+def render_page(path, view, query=None):
+    request = RequestFactory().get(path, query)
+    request.user = AnonymousUser()
+
+    response = view(request)
+    if response.status_code != 200:
+        raise ValueError(f"{path} responded with {response.status_code}")
+
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def write_page(root, filename, content):
+    target = os.path.join(root, filename)
+    write_file(target, content)
+    write_file(target + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        write_file(target + '.br', brotli.compress(content, quality=11))
+
+
+def write_file(target, content):
+    # пишем во временный файл и подменяем, чтобы сервер не отдал недописанную страницу
+    tmp_target = target + '.tmp'
+    with open(tmp_target, 'wb') as file:
+        file.write(content)
+    os.replace(tmp_target, target)
+
+
+def remove_page(root, filename):
+    target = os.path.join(root, filename)
+    for path in (target,) + tuple(target + suffix for suffix in COMPRESSED_SUFFIXES):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def schedule_export(pages):
+    global _worker
+
+    with _pending_lock:
+        _pending_pages.update(pages)
+        if _worker is None:
+            _worker = threading.Thread(target=_export_pending_pages, name='static-export', daemon=True)
+            _worker.start()
+
+
+def _export_pending_pages():
+    global _worker
+
+    try:
+        while True:
+            with _pending_lock:
+                if not _pending_pages:
+                    _worker = None
+                    return
+                pages = set(_pending_pages)
+                _pending_pages.clear()
+
+            try:
+                export_pages(pages)
+            except Exception as e:
+                landing.views.add_log_to_db(
+                    "Failed to export static pages: " + str(e), traceback.extract_stack(), sorted(pages))
+    finally:
+        connections.close_all()
@@ -0,0 +1,56 @@
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_ADDRESSED_PREFIX = 'landing/cas/'
+# недописанные файлы - вне CONTENT_ADDRESSED_PREFIX, который отдаётся как immutable
+CONTENT_ADDRESSED_TMP_DIR = 'landing/cas-tmp'
+
+
+def is_content_addressed(name):
+    return name.startswith(CONTENT_ADDRESSED_PREFIX)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    # Файл хранится под sha256 своего содержимого: одинаковые фото у разных объектов лежат один раз
+    # и имеют один url, который никогда не меняется (можно кешировать как immutable)
+
+    def get_available_name(self, name, max_length=None):
+        # имя определяется содержимым, совпадение означает тот же файл
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+        # FILE_UPLOAD_TEMP_DIR годится, только если он на той же файловой системе (os.replace)
+        tmp_dir = settings.FILE_UPLOAD_TEMP_DIR or self.path(CONTENT_ADDRESSED_TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            # хеш считаем в том же проходе, в котором пишем файл на диск
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp_file.write(chunk)
+
+            hexdigest = digest.hexdigest()
+            name = f'{CONTENT_ADDRESSED_PREFIX}{hexdigest[:2]}/{hexdigest[2:4]}/{hexdigest}{extension}'
+            full_path = self.path(name)
+
+            if os.path.exists(full_path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, full_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return name
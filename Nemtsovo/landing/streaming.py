@@ -0,0 +1,74 @@
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+
+from landing.db_routers import _routing_state, use_routing_state
+
+STREAMED_HEAD_TEMPLATE = 'landing/includes/streamed-head.html'
+
+# ресурсы из head.html/base.html, которые браузер может начать грузить до html.
+# Фронтовой сервер (nginx early_hints, CDN) превращает эти Link-заголовки в 103 Early Hints
+LOCAL_PRELOADS = (
+    ('landing/css/index.css', 'style'),
+    ('landing/fonts/Montserrat/Montserrat-VariableFont_wght.ttf', 'font'),
+    ('landing/fonts/Vulgat/Vulgat-Bold.ttf', 'font'),
+    ('landing/js/packages/air-datepicker/dist/air-datepicker.css', 'style'),
+    ('landing/js/packages/air-datepicker/dist/air-datepicker.js', 'script'),
+    ('landing/js/main.js', 'script'),
+)
+CDN_PRELOADS = (
+    ('https://cdn.jsdelivr.net/npm/@fancyapps/ui@5.0/dist/carousel/carousel.css', 'style'),
+    ('https://cdn.jsdelivr.net/npm/@fancyapps/ui@5.0/dist/fancybox/fancybox.css', 'style'),
+    ('https://cdn.jsdelivr.net/npm/@splidejs/splide@4.1.4/dist/css/themes/splide-skyblue.min.css', 'style'),
+    ('https://cdn.jsdelivr.net/npm/@fancyapps/ui@5.0/dist/carousel/carousel.umd.js', 'script'),
+    ('https://cdn.jsdelivr.net/npm/@fancyapps/ui@5.0/dist/fancybox/fancybox.umd.js', 'script'),
+    ('https://cdn.jsdelivr.net/npm/@splidejs/splide@4.1.4/dist/js/splide.min.js', 'script'),
+)
+
+_preload_header = None
+
+
+def get_preload_header():
+    global _preload_header
+
+    if _preload_header is None:
+        links = ['<https://cdn.jsdelivr.net>; rel=preconnect; crossorigin']
+        for path, kind in LOCAL_PRELOADS:
+            link = f'<{static(path)}>; rel=preload; as={kind}'
+            if kind == 'font':
+                link += '; crossorigin'
+            links.append(link)
+        # теги в head.html/base.html подключают их без crossorigin - режим CORS у preload должен совпадать,
+        # иначе браузер выбросит preload и скачает файл второй раз
+        for url, kind in CDN_PRELOADS:
+            links.append(f'<{url}>; rel=preload; as={kind}')
+        _preload_header = ', '.join(links)
+
+    return _preload_header
+
+
+def add_preload_links(response):
+    response['Link'] = get_preload_header()
+    return response
+
+
+def stream_page(request, template_name, title, get_context):
+    # head уходит клиенту сразу, запросы к БД и рендер страницы - уже после.
+    # Генератор перебирается, когда replica_routing_middleware уже сбросил состояние маршрутизации,
+    # поэтому запоминаем его здесь; под ASGI каждый кусок идёт в своём контексте, так что состояние
+    # ставится и снимается в пределах одного куска
+    state = _routing_state.get()
+
+    def chunks():
+        yield render_to_string(STREAMED_HEAD_TEMPLATE, {'title': title}, request)
+
+        with use_routing_state(state):
+            context = get_context()
+            context['head_sent'] = True
+            html = render_to_string(template_name, context, request)
+        yield html
+
+    response = StreamingHttpResponse(chunks(), content_type='text/html; charset=utf-8')
+    # иначе nginx соберёт ответ целиком в буфер и head не уйдёт раньше
+    response['X-Accel-Buffering'] = 'no'
+    return add_preload_links(response)
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import mimetypes
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+
+READ_SIZE = 64 * 1024
+UPLOAD_ID_LENGTH = 32
+
+
+class UploadError(Exception):
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class ChunkedUploadedFile(UploadedFile):
+    # собранный файл уже на диске: FileSystemStorage перемещает его по temporary_file_path(), а не копирует.
+    # Открывается он только если его читают (оптимизация фото, хранилище без temporary_file_path)
+
+    def __init__(self, path, name, size):
+        self._file = None
+        super().__init__(None, name, mimetypes.guess_type(name)[0], size)
+        self.path = path
+
+    @property
+    def file(self):
+        if self._file is None:
+            self._file = open(self.path, 'rb')
+        return self._file
+
+    @file.setter
+    def file(self, value):
+        self._file = value
+
+    def temporary_file_path(self):
+        return self.path
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def get_paths(upload_id):
+    # id приходит от клиента - пускаем только то, что могли выдать сами
+    if len(upload_id) != UPLOAD_ID_LENGTH or not all(char in '0123456789abcdef' for char in upload_id):
+        raise UploadError('Загрузка не найдена', 404)
+    path = os.path.join(settings.CHUNKED_UPLOAD_DIR, upload_id)
+    return path + '.json', path + '.part'
+
+
+def get_upload(upload_id, user):
+    meta_path, part_path = get_paths(upload_id)
+    try:
+        with open(meta_path) as file:
+            upload = json.load(file)
+    except (OSError, ValueError):
+        raise UploadError('Загрузка не найдена', 404)
+    # продолжать и прикреплять загрузку может только тот, кто её начал
+    if upload['user_id'] != getattr(user, 'pk', None):
+        raise UploadError('Загрузка не найдена', 404)
+
+    upload['offset'] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    return upload
+
+
+def purge_expired_uploads():
+    # брошенные загрузки (.part давно не дописывался) и метаданные тех, чей файл уже забрало хранилище
+    expire_before = time.time() - settings.CHUNKED_UPLOAD_EXPIRE_HOURS * 60 * 60
+    for entry in os.scandir(settings.CHUNKED_UPLOAD_DIR):
+        if not entry.name.endswith('.json'):
+            continue
+        upload_path = entry.path[:-len('.json')]
+        try:
+            if os.path.getmtime(upload_path + '.part') >= expire_before:
+                continue
+            os.remove(upload_path + '.part')
+        except FileNotFoundError:
+            pass
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def start_upload(name, size, user):
+    if not name or size <= 0:
+        raise UploadError('Не указаны имя или размер файла')
+    if size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise UploadError(f'Файл больше {settings.CHUNKED_UPLOAD_MAX_SIZE // 1024 // 1024} МБ', 413)
+
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    purge_expired_uploads()
+
+    upload_id = uuid.uuid4().hex
+    meta_path, part_path = get_paths(upload_id)
+    # сначала файл, потом метаданные: purge_expired_uploads не должен принять загрузку за завершённую
+    open(part_path, 'xb').close()
+    with open(meta_path, 'x') as file:
+        json.dump({'name': os.path.basename(name), 'size': size, 'user_id': user.pk}, file)
+
+    return upload_id
+
+
+@contextmanager
+def locked(file):
+    # одну загрузку могут продолжать две вкладки - второй отвечаем 409, а не перемешиваем куски
+    if fcntl is None:
+        yield
+        return
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise UploadError('Загрузка уже идёт', 409)
+    try:
+        yield
+    finally:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def write_chunk(upload_id, user, offset, length, checksum, stream):
+    # Кусок пишется в конец .part прямо из тела запроса, sha256 считается по ходу записи.
+    # Если сумма не сошлась или соединение оборвалось, файл обрезается обратно до offset
+    upload = get_upload(upload_id, user)
+    if length <= 0 or length > settings.CHUNKED_UPLOAD_CHUNK_SIZE or offset + length > upload['size']:
+        raise UploadError('Неверный размер куска', 413, upload['offset'])
+
+    _, part_path = get_paths(upload_id)
+    with open(part_path, 'r+b') as part, locked(part):
+        current_offset = os.fstat(part.fileno()).st_size
+        if offset != current_offset:
+            raise UploadError('Кусок не по порядку', 409, current_offset)
+
+        part.seek(offset)
+        digest = hashlib.sha256()
+        remaining = length
+        try:
+            while remaining:
+                data = stream.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                digest.update(data)
+                part.write(data)
+                remaining -= len(data)
+        except OSError:
+            remaining = -1
+
+        if remaining or digest.hexdigest() != checksum.lower():
+            part.truncate(offset)
+            raise UploadError('Кусок повреждён, отправьте его ещё раз', 400, offset)
+
+    os.utime(part_path)
+    return offset + length
+
+
+def remove_upload(upload_id):
+    # после сохранения: .part уже перемещён хранилищем или заменён оптимизированной копией
+    for path in get_paths(upload_id):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def get_uploaded_file(upload_id, user):
+    upload = get_upload(upload_id, user)
+    if upload['offset'] != upload['size']:
+        raise UploadError('Файл загружен не полностью', 409, upload['offset'])
+
+    _, part_path = get_paths(upload_id)
+    return ChunkedUploadedFile(part_path, upload['name'], upload['size'])
@@ -1,16 +1,31 @@
-from django.urls import path
+from django.urls import path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+import landing.media
 import landing.views
 
+if settings.ASYNC_VIEWS:
+    public_views = (landing.views.index_async, landing.views.events_async, landing.views.news_async,
+                    landing.views.our_products_async)
+else:
+    public_views = (landing.views.index, landing.views.events, landing.views.news, landing.views.our_products)
+
+index_view, events_view, news_view, our_products_view = public_views
+
 urlpatterns = [
-    path('', landing.views.index, name='index'),
-    path('events', landing.views.events, name='events'),
-    path('news', landing.views.news, name='news'),
-    path('products', landing.views.our_products, name='our_products'),
+    path('', index_view, name='index'),
+    path('events', events_view, name='events'),
+    path('news', news_view, name='news'),
+    path('products', our_products_view, name='our_products'),
+    path('gallery/<int:content_type_id>/<int:object_id>', landing.views.gallery, name='gallery'),
+    path('search', landing.views.search, name='search'),
     path('add-booking', landing.views.add_booking, name='add_booking'),
-    path('get-booked-days/<int:booking_identifier_id>', landing.views.get_booked_days, name='get_booked_days')
+    path('get-booked-days/<int:booking_identifier_id>', landing.views.get_booked_days, name='get_booked_days'),
+    path('rate-limit-stats', landing.views.rate_limit_stats, name='rate_limit_stats'),
+    path('chunked-upload', landing.views.chunked_upload, name='chunked_upload'),
+    path('chunked-upload/<str:upload_id>', landing.views.chunked_upload_part, name='chunked_upload_part'),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+if settings.SERVE_MEDIA:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), landing.media.serve_media, name='media')
+    ]
\ No newline at end of file
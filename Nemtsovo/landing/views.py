@@ -1,74 +1,245 @@
+import asyncio
 import json
 from datetime import datetime, timedelta
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, transaction
 from django.utils import timezone
 
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.core.paginator import Paginator
-from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseServerError, HttpResponse
+from django.db.models import Exists, OuterRef, Prefetch, Q
+from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseServerError, HttpResponse, Http404
 from django.shortcuts import render
+from django.templatetags.static import static
+from django.utils.cache import patch_cache_control
+from django.views.decorators.csrf import ensure_csrf_cookie
+from easy_thumbnails.files import get_thumbnailer
+from landing.db_routers import read_from_replica
+from landing.forms import ProductFilterForm
+from landing.paginators import get_keyset_page
+from landing.notifications import enqueue_booking_notification
+from landing.ratelimit import rate_limited, get_counters
+from landing.search import search as search_documents, get_result, SearchUnavailable
+from landing.streaming import stream_page, add_preload_links
+from landing.uploads import UploadError, start_upload, get_upload, write_chunk
 from landing.models import House, AdditionalInfo, WellnessTreatment, Action, OurProduct, Event, News, Booking, OurPet, \
-    ErrorLog
+    ErrorLog, Attachment, WithGallery
 import traceback
 
+NEWS_PER_PAGE = 5
+CARD_RELATED_FIELDS = ('period', 'additional_info', 'booking_identifier')
+GALLERY_CACHE_KEY = 'gallery:{}:{}'
+GALLERY_CACHE_TIMEOUT = 60 * 60 * 24
+GALLERY_THUMBNAIL_OPTIONS = {'size': (420, 300), 'crop': True, 'detail': True}
+SEARCH_MIN_QUERY_LENGTH = 2
+PRODUCTS_PER_PAGE = 24
+# последнее поле делает порядок однозначным для пагинации по ключу
+PRODUCTS_ORDERING = ('-is_available', 'price', 'id')
+SEARCH_RESULTS_LIMIT = 20
+
+
+def prefetch_covers():
+    # первое по порядку Фото/Видео объекта, одним запросом на все карточки
+    earlier_attachments = Attachment.objects.filter(
+        content_type=OuterRef('content_type'),
+        object_id=OuterRef('object_id')
+    ).filter(Q(order__lt=OuterRef('order')) | Q(order=OuterRef('order'), pk__lt=OuterRef('pk')))
+
+    return Prefetch('media', queryset=Attachment.objects.filter(~Exists(earlier_attachments)), to_attr='covers')
+
+
+def get_index_querysets():
+    now = timezone.now()
+    return {
+        'houses': House.objects.select_related(*CARD_RELATED_FIELDS).prefetch_related(prefetch_covers()),
+        'additional_info': AdditionalInfo.objects.prefetch_related('additionalinfoitem_set'),
+        'wellness_treatments': WellnessTreatment.objects.select_related(*CARD_RELATED_FIELDS)
+                                                        .prefetch_related(prefetch_covers()),
+        'actions': Action.objects.select_related(*CARD_RELATED_FIELDS).prefetch_related(prefetch_covers()),
+        'our_products': OurProduct.objects.exclude(is_available=False)[:10],
+        'future_events': Event.objects.filter(date__gt=now)[:5],
+        'news': News.objects.all()[:5],
+        'our_pets': OurPet.objects.prefetch_related(prefetch_covers())
+    }
+
+
+def get_events_querysets():
+    now = timezone.now()
+    events_qs = Event.objects.prefetch_related('media')
+    return {
+        'future_events': events_qs.filter(date__gt=now),
+        'past_events': events_qs.filter(date__lte=now)[:10]
+    }
+
+
+def get_products_context(request):
+    filter_form = ProductFilterForm(request.GET)
+    page = get_keyset_page(
+        filter_form.filter(OurProduct.objects.prefetch_related('media')),
+        PRODUCTS_ORDERING,
+        request.GET.get('after'),
+        PRODUCTS_PER_PAGE)
+
+    next_url = None
+    if page.has_next:
+        query = request.GET.copy()
+        query['after'] = page.next_cursor
+        next_url = '?' + query.urlencode()
+
+    return {'products': page.object_list, 'filter_form': filter_form, 'next_url': next_url}
+
+
+def get_news_page(request):
+    paginator = Paginator(News.objects.prefetch_related('media'), NEWS_PER_PAGE)
 
+    page_number = request.GET.get('page') or 1
+    news_page = paginator.get_page(page_number)
+    # вычисляем страницу сразу, чтобы в шаблоне не было запросов
+    news_page.object_list = list(news_page.object_list)
+    return news_page
+
+
+PAGE_TITLES = {
+    'landing/index.html': 'Экоферма в Немцово',
+    'landing/events.html': 'Мероприятия',
+    'landing/news.html': 'Новости',
+    'landing/our-products.html': 'Наша продукция',
+}
+
+
+def render_page(request, template_name, get_context):
+    if settings.STREAMED_PAGES:
+        return stream_page(request, template_name, PAGE_TITLES[template_name], get_context)
+    return add_preload_links(render(request, template_name, get_context()))
+
+
+@read_from_replica
 def index(request):
-    houses = House.objects.all()
-    additional_info = AdditionalInfo.objects.all()
-    wellness_treatments = WellnessTreatment.objects.all()
-    actions = Action.objects.all()
-    available_products = OurProduct.objects.exclude(is_available=False)[:10]
-    future_events = sorted(
-        filter(lambda event: event.is_passed() is False, Event.objects.all()),
-        key=lambda event: event.date)[:5]
-    latest_news = News.objects.all()[:5]
-    our_pets = OurPet.objects.all()
-
-    return render(
-        request,
-        'landing/index.html',
-        {
-            'houses': houses,
-            'additional_info': additional_info,
-            'wellness_treatments': wellness_treatments,
-            'actions': actions,
-            'our_products': available_products,
-            'future_events': future_events,
-            'news': latest_news,
-            'our_pets': our_pets
-        })
+    return render_page(request, 'landing/index.html', get_index_querysets)
 
 
+@read_from_replica
 def events(request):
-    events_qs = Event.objects.all()
-    future_events = sorted(filter(lambda event: event.is_passed() is False, events_qs), key=lambda event: event.date)
-    past_events = sorted(filter(lambda event: event.is_passed() is True, events_qs), key=lambda event: event.date)
-
-    return render(request, "landing/events.html", {
-        'future_events': future_events,
-        'past_events': past_events[:10]
-    })
+    return render_page(request, "landing/events.html", get_events_querysets)
 
 
+@read_from_replica
 def news(request):
-    all_news = News.objects.all()
-    paginator = Paginator(all_news, 5)
+    return render_page(request, 'landing/news.html', lambda: {'news': get_news_page(request)})
 
-    page_number = request.GET.get('page') or 1
-    news_page = paginator.get_page(page_number)
 
-    return render(
-        request,
-        'landing/news.html',
-        {'news': news_page})
+@read_from_replica
+def our_products(request):
+    return render_page(request, 'landing/our-products.html', lambda: get_products_context(request))
 
 
-def our_products(request):
-    all_products = OurProduct.objects.all()
-    return render(
-        request,
-        'landing/our-products.html',
-        {'products': all_products})
+def _evaluate_queryset(queryset):
+    try:
+        return list(queryset)
+    finally:
+        # запрос выполнялся в потоке из пула, его соединение закрываем здесь же
+        close_old_connections()
 
 
+# независимые querysets выполняются параллельно, каждый в своём потоке и соединении с БД
+async def fetch_concurrently(querysets):
+    names = list(querysets)
+    results = await asyncio.gather(
+        *(sync_to_async(_evaluate_queryset, thread_sensitive=False)(querysets[name]) for name in names))
+    return dict(zip(names, results))
+
+
+async def render_async(request, template_name, context):
+    # рендер шаблона синхронный и может обращаться к БД - выносим его из event loop.
+    # Потоковый режим здесь не используется: в Django 4.1 ASGI перебирает StreamingHttpResponse прямо в event loop
+    response = await sync_to_async(render)(request, template_name, context)
+    return add_preload_links(response)
+
+
+@read_from_replica
+async def index_async(request):
+    context = await fetch_concurrently(get_index_querysets())
+    return await render_async(request, 'landing/index.html', context)
+
+
+@read_from_replica
+async def events_async(request):
+    context = await fetch_concurrently(get_events_querysets())
+    return await render_async(request, "landing/events.html", context)
+
+
+@read_from_replica
+async def news_async(request):
+    news_page = await sync_to_async(get_news_page)(request)
+    return await render_async(request, 'landing/news.html', {'news': news_page})
+
+
+@read_from_replica
+async def our_products_async(request):
+    context = await sync_to_async(get_products_context)(request)
+    return await render_async(request, 'landing/our-products.html', context)
+
+
+def get_gallery_items(content_type_id, object_id):
+    content_type = ContentType.objects.get_for_id(content_type_id)
+    model = content_type.model_class()
+    if model is None or not issubclass(model, WithGallery):
+        raise Http404()
+    # иначе кеш можно забить пустыми галереями несуществующих объектов
+    if not model._default_manager.filter(pk=object_id).exists():
+        raise Http404()
+
+    items = []
+    for media in Attachment.objects.filter(content_type=content_type, object_id=object_id):
+        if media.is_video():
+            items.append({'src': media.file.url, 'type': 'html5video', 'thumb': static('landing/img/video-stub.png')})
+            continue
+
+        thumbnail_options = dict(GALLERY_THUMBNAIL_OPTIONS, box=media.miniature)
+        thumbnail = get_thumbnailer(media.file).get_thumbnail(thumbnail_options)
+        items.append({'src': media.file.url, 'thumb': thumbnail.url})
+
+    return items
+
+
+@read_from_replica
+def gallery(request, content_type_id, object_id):
+    cache_key = GALLERY_CACHE_KEY.format(content_type_id, object_id)
+    items = cache.get(cache_key)
+    if items is None:
+        try:
+            items = get_gallery_items(content_type_id, object_id)
+        except ContentType.DoesNotExist:
+            raise Http404()
+        cache.set(cache_key, items, GALLERY_CACHE_TIMEOUT)
+
+    response = JsonResponse({'items': items})
+    patch_cache_control(response, public=True, max_age=300)
+    return response
+
+
+@rate_limited('search')
+@read_from_replica
+def search(request):
+    query = request.GET.get('q', '').strip()
+    if len(query) < SEARCH_MIN_QUERY_LENGTH:
+        return HttpResponseBadRequest(f'Запрос должен быть не короче {SEARCH_MIN_QUERY_LENGTH} символов')
+
+    try:
+        documents = search_documents(query, limit=SEARCH_RESULTS_LIMIT)
+    except SearchUnavailable:
+        return HttpResponse('Search is not available', status=503)
+
+    results = [get_result(document) for document in documents]
+    response = JsonResponse({'query': query, 'results': results})
+    patch_cache_control(response, public=True, max_age=300)
+    return response
+
+
+@rate_limited('add_booking')
 def add_booking(request):
     if not request.method == 'POST':
         return HttpResponseBadRequest("The request type must be POST")
@@ -100,7 +271,10 @@ def add_booking(request):
             is_early_checkin=early_checkin,
             user_comment=form_data['comment']
         )
-        new_booking.save()
+        # уведомление уйдёт воркером, но только если заявка сохранилась
+        with transaction.atomic():
+            new_booking.save()
+            enqueue_booking_notification(new_booking)
     except Exception as e:
         err_message = "An error occured while saving new booking: " + str(e)
         add_log_to_db(err_message, traceback.extract_stack(), form_data)
@@ -110,6 +284,10 @@ def add_booking(request):
     return HttpResponse(status=201)
 
 
+# страницы могут отдаваться статикой, поэтому csrf-cookie для add_booking ставим здесь
+@rate_limited('get_booked_days')
+@ensure_csrf_cookie
+@read_from_replica
 def get_booked_days(request, booking_identifier_id):
     if not booking_identifier_id or booking_identifier_id == 0:
         message = 'booking_identifier is empty'
@@ -161,6 +339,59 @@ def get_booked_days(request, booking_identifier_id):
     return JsonResponse({'booked_dates': list(booked_dates_str)})
 
 
+# сколько запросов пропущено и отброшено лимитами (без SHARED_CACHE_DIR - только этого воркера)
+@staff_member_required
+def rate_limit_stats(request):
+    return JsonResponse(get_counters())
+
+
+def upload_error_response(error):
+    return JsonResponse({'error': str(error), 'offset': error.offset}, status=error.status)
+
+
+# большие Фото/Видео админка загружает частями (landing.uploads, admin-chunked-upload.js)
+@staff_member_required
+def chunked_upload(request):
+    if not request.method == 'POST':
+        return HttpResponseBadRequest("The request type must be POST")
+
+    try:
+        data = json.loads(request.body)
+        upload_id = start_upload(str(data.get('name', '')), int(data.get('size', 0)), request.user)
+    except (ValueError, TypeError, AttributeError):
+        return HttpResponseBadRequest("The request body must be JSON with name and size")
+    except UploadError as e:
+        return upload_error_response(e)
+
+    return JsonResponse({'id': upload_id, 'offset': 0, 'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE}, status=201)
+
+
+# GET - сколько байт уже на сервере, PUT ?offset= - следующий кусок с заголовком X-Chunk-Sha256
+@staff_member_required
+def chunked_upload_part(request, upload_id):
+    try:
+        if request.method == 'GET':
+            upload = get_upload(upload_id, request.user)
+            return JsonResponse({'id': upload_id, 'offset': upload['offset'], 'size': upload['size']})
+
+        if not request.method == 'PUT':
+            return HttpResponseBadRequest("The request type must be GET or PUT")
+
+        offset = write_chunk(
+            upload_id,
+            request.user,
+            int(request.GET.get('offset', '')),
+            int(request.META.get('CONTENT_LENGTH') or 0),
+            request.headers.get('X-Chunk-Sha256', ''),
+            request)
+    except ValueError:
+        return HttpResponseBadRequest("offset and Content-Length must be integers")
+    except UploadError as e:
+        return upload_error_response(e)
+
+    return JsonResponse({'id': upload_id, 'offset': offset})
+
+
 def get_all_dates_in_range(date_start_str, date_end_str, is_include_last=False):
     date_start = get_parsed_date(date_start_str)
     date_end = get_parsed_date(date_end_str)
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template, render_to_string
+from django.urls import get_resolver, reverse
+
+# шаблоны, которые компилируются на первом запросе; cached loader держит их до перезапуска воркера
+TEMPLATES = [
+    'landing/base.html',
+    'landing/includes/head.html',
+    'landing/includes/streamed-head.html',
+    'landing/includes/gallery-cover.html',
+    'landing/index.html',
+    'landing/events.html',
+    'landing/news.html',
+    'landing/our-products.html',
+]
+
+PAGE_URLS = ['index', 'events', 'news', 'our_products']
+
+
+def import_heavy_modules():
+    # views тянут easy_thumbnails, admin - image_cropping и adminsortable2
+    import landing.views  # noqa: F401
+    import landing.admin  # noqa: F401
+
+
+def resolve_urls():
+    resolver = get_resolver()
+    # reverse заполняет словари обратного разрешения, url_patterns - импортирует все urlconf
+    resolver.url_patterns
+    for name in PAGE_URLS:
+        reverse(name)
+
+
+def compile_templates():
+    for template_name in TEMPLATES:
+        get_template(template_name)
+
+
+def prime_caches():
+    # Шаблоны рендерим напрямую, а не через views и тестовый клиент: запуск воркера не должен тратить
+    # токены rate limit и писать в ErrorLog. Заодно создаются превью картинок и выполняются запросы страниц
+    # django.test импортируем только здесь, чтобы не утяжелять импорт воркера
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+    from landing.views import get_index_querysets, get_events_querysets, get_news_page, get_products_context
+
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    pages = {
+        'landing/index.html': get_index_querysets,
+        'landing/events.html': get_events_querysets,
+        'landing/news.html': lambda: {'news': get_news_page(request)},
+        'landing/our-products.html': lambda: get_products_context(request),
+    }
+    for template_name, get_context in pages.items():
+        render_to_string(template_name, get_context(), request)
+
+
+_fork_hook_registered = False
+
+
+def close_connections_before_fork():
+    # gunicorn --preload прогревает приложение в мастере до fork: воркеры не должны унаследовать
+    # его сокеты к БД, иначе несколько процессов будут писать в одно соединение
+    connections.close_all()
+
+
+def open_connections():
+    # после запросов клиента соединения закрылись по request_finished (если CONN_MAX_AGE = 0),
+    # поэтому открываем их последними
+    global _fork_hook_registered
+
+    if not _fork_hook_registered and hasattr(os, 'register_at_fork'):
+        os.register_at_fork(before=close_connections_before_fork)
+        _fork_hook_registered = True
+
+    for alias in settings.DATABASES:
+        connections[alias].ensure_connection()
+
+
+STAGES = [
+    ('imports', import_heavy_modules),
+    ('urls', resolve_urls),
+    ('templates', compile_templates),
+    ('caches', prime_caches),
+    ('connections', open_connections),
+]
+
+
+# возвращает длительность каждого этапа в секундах; ошибка этапа не мешает запуску воркера
+def warm_up(skip=()):
+    from landing.views import add_log_to_db
+
+    timings = {}
+    for name, stage in STAGES:
+        if name in skip:
+            continue
+        started_at = time.perf_counter()
+        try:
+            stage()
+        except Exception as e:
+            add_log_to_db(f"Worker warm-up stage '{name}' failed: " + str(e), traceback.extract_stack())
+        timings[name] = time.perf_counter() - started_at
+
+    return timings
+
+
+def warm_up_in_thread():
+    try:
+        warm_up(skip=('connections',))
+    finally:
+        connections.close_all()
+
+
+def warm_up_worker():
+    if not settings.WARMUP_ON_START:
+        return
+
+    # Под ASGI каждый запрос идёт в новом потоке, а соединения джанги привязаны к потоку:
+    # заранее открытые соединения запросам не достанутся, поэтому этап connections пропускаем
+    skip = ('connections',) if settings.SERVED_BY_ASGI else ()
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        warm_up(skip)
+        if skip:
+            # соединения, через которые шли запросы прогрева, тоже никому не достанутся
+            connections.close_all()
+        return
+
+    # ASGI-сервер может импортировать приложение внутри event loop, где ORM запрещена, - прогрев идёт
+    # в отдельном потоке, и его соединения тем более не пригодятся
+    thread = threading.Thread(target=warm_up_in_thread, name='warm-up')
+    thread.start()
+    thread.join()